@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Memory used by the state of a synthetic organization held as PyGithub objects, as parsed JSON
+and as snapshot records
+
+    python benchmarks/snapshot_memory.py --repositories 10000
+"""
+
+import gc
+import json
+import random
+import tracemalloc
+
+import click
+from github import Github
+from github.NamedUser import NamedUser
+from github.Repository import Repository
+from github.Team import Team
+
+from github_team_organizer.classes.snapshot import OrganizationSnapshot
+
+API = 'https://api.github.com'
+
+
+def user_payload(login: str) -> dict:
+    return {
+        'login': login, 'id': hash(login) & 0xffffff, 'node_id': f'MDQ6VXNlcj{login}', 'type': 'User',
+        'site_admin': False, 'avatar_url': f'https://avatars.githubusercontent.com/u/{login}', 'gravatar_id': '',
+        'url': f'{API}/users/{login}', 'html_url': f'https://github.com/{login}',
+        'followers_url': f'{API}/users/{login}/followers', 'following_url': f'{API}/users/{login}/following',
+        'gists_url': f'{API}/users/{login}/gists', 'starred_url': f'{API}/users/{login}/starred',
+        'subscriptions_url': f'{API}/users/{login}/subscriptions', 'organizations_url': f'{API}/users/{login}/orgs',
+        'repos_url': f'{API}/users/{login}/repos', 'events_url': f'{API}/users/{login}/events',
+        'received_events_url': f'{API}/users/{login}/received_events',
+    }
+
+
+def team_payload(org: str, slug: str) -> dict:
+    return {
+        'id': hash(slug) & 0xffffff, 'node_id': f'MDQ6VGVhbT{slug}', 'name': slug, 'slug': slug,
+        'description': f'Team {slug}', 'privacy': 'closed', 'permission': 'pull',
+        'url': f'{API}/teams/{slug}', 'html_url': f'https://github.com/orgs/{org}/teams/{slug}',
+        'members_url': f'{API}/teams/{slug}/members{{/member}}', 'repositories_url': f'{API}/teams/{slug}/repos',
+        'parent': None,
+    }
+
+
+def repository_payload(org: str, name: str) -> dict:
+    full_name = f'{org}/{name}'
+    return {
+        'id': hash(name) & 0xffffff, 'node_id': f'MDEwOlJlcG9zaXRvcnk{name}', 'name': name, 'full_name': full_name,
+        'private': True, 'owner': user_payload(org), 'html_url': f'https://github.com/{full_name}',
+        'description': f'Repository {name}', 'fork': False, 'url': f'{API}/repos/{full_name}',
+        'archived': False, 'default_branch': 'master', 'created_at': '2020-01-01T00:00:00Z',
+        'updated_at': '2020-06-01T00:00:00Z', 'pushed_at': '2020-06-01T00:00:00Z',
+        'git_url': f'git://github.com/{full_name}.git', 'ssh_url': f'git@github.com:{full_name}.git',
+        'clone_url': f'https://github.com/{full_name}.git', 'size': 1024, 'language': 'Python',
+        'has_issues': True, 'has_projects': True, 'has_wiki': True, 'has_pages': False, 'forks_count': 0,
+        'open_issues_count': 0, 'watchers_count': 0, 'stargazers_count': 0,
+        'permissions': {'admin': True, 'push': True, 'pull': True},
+        **{f'{k}_url': f'{API}/repos/{full_name}/{k}' for k in (
+            'branches', 'collaborators', 'commits', 'contents', 'contributors', 'hooks', 'issues', 'keys',
+            'labels', 'languages', 'merges', 'milestones', 'pulls', 'releases', 'tags', 'teams', 'trees',
+        )},
+    }
+
+
+def generate(organization: str, repositories: int, teams: int, users: int, seed: int) -> dict:
+    """
+    Organization snapshot as it's saved to a file, every string is a separate object as after JSON parsing
+    """
+    rnd = random.Random(seed)
+    slugs = [f'team-{i}' for i in range(teams)]
+    logins = [f'user-{i}' for i in range(users)]
+
+    document = {
+        'login': organization,
+        'teams': [
+            {
+                'slug': slug, 'name': slug, 'description': f'Team {slug}', 'privacy': 'closed', 'node_id': f'T{i}',
+                'members': {login: rnd.choice(('member', 'maintainer')) for login in rnd.sample(logins, 20)},
+                'repositories': {},
+                'parent': None,
+            }
+            for i, slug in enumerate(slugs)
+        ],
+        'repositories': [
+            {
+                'name': f'repository-{i}', 'is_archived': False, 'is_fork': False, 'default_branch_name': 'master',
+                'updated_at': '2020-06-01T00:00:00Z',
+                'teams': {slug: rnd.choice(('pull', 'push', 'admin')) for slug in rnd.sample(slugs, 3)},
+                'collaborators': rnd.sample(logins, 2),
+                'protection_rules': [{
+                    'pattern': 'master', 'node_id': f'P{i}',
+                    'settings': {'requires_approving_reviews': True, 'required_approving_review_count': 1},
+                }],
+            }
+            for i in range(repositories)
+        ],
+    }
+    # Round trip through JSON, so equal strings are not shared as they would be in a parsed file
+    return json.loads(json.dumps(document))
+
+
+def build_pygithub(document: dict) -> list:
+    requester = Github()._Github__requester
+    organization = document['login']
+    objects = []
+    for team in document['teams']:
+        objects.append(Team(requester, {}, team_payload(organization, team['slug']), completed=True))
+        objects.extend(NamedUser(requester, {}, user_payload(login), completed=True) for login in team['members'])
+    for repository in document['repositories']:
+        objects.append(Repository(requester, {}, repository_payload(organization, repository['name']), completed=True))
+        objects.extend(
+            NamedUser(requester, {}, user_payload(login), completed=True) for login in repository['collaborators']
+        )
+    return objects
+
+
+def measure(build, *args) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = build(*args)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / 1024 / 1024
+
+
+@click.command(help='Compare memory used by organization state representations')
+@click.option('--repositories', default=10000, type=click.IntRange(min=1), help='Number of repositories')
+@click.option('--teams', default=500, type=click.IntRange(min=1), help='Number of teams')
+@click.option('--users', default=3000, type=click.IntRange(min=20), help='Number of users')
+@click.option('--seed', default=42, help='Random seed')
+def run(repositories, teams, users, seed):
+    results = {
+        'PyGithub objects': measure(
+            lambda: build_pygithub(generate('acme', repositories, teams, users, seed))
+        ),
+        'Parsed JSON': measure(generate, 'acme', repositories, teams, users, seed),
+        'Snapshot records': measure(
+            lambda: OrganizationSnapshot.from_dict(generate('acme', repositories, teams, users, seed))
+        ),
+    }
+
+    click.echo(f'{repositories} repositories, {teams} teams, {users} users:')
+    for name, size in results.items():
+        click.echo(f' - {name}: {size:.1f} MiB')
+
+
+if __name__ == '__main__':
+    run()
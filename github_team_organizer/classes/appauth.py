@@ -0,0 +1,109 @@
+import calendar
+import logging
+import os
+import threading
+import time
+import typing
+from pathlib import Path
+
+from github import GithubIntegration
+from github.MainClass import DEFAULT_BASE_URL
+from github.InstallationAuthorization import InstallationAuthorization
+
+from github_team_organizer.classes.tracing import Tracer
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_api_url() -> str:
+    """
+    Base URL of the REST API, ``GITHUB_API_URL`` is set for GitHub Enterprise or a local stand-in server
+    """
+    return (os.getenv('GITHUB_API_URL') or DEFAULT_BASE_URL).rstrip('/')
+
+
+def get_graphql_url() -> str:
+    api_url = get_api_url()
+    if api_url.endswith('/v3'):
+        # GitHub Enterprise serves REST API at /api/v3 and GraphQL API at /api/graphql
+        api_url = api_url[:-len('/v3')]
+    return f'{api_url}/graphql'
+
+
+class GitHubAppAuth:
+    """
+    Installation access token of a GitHub App, shared by REST and GraphQL clients
+
+    The token is requested with a JWT signed by the private key of the app and is requested again
+    ``refresh_margin`` seconds before it expires (tokens live for an hour), so long runs keep working.
+    """
+
+    __instance = None
+
+    refresh_margin = 5 * 60
+
+    def __new__(cls, *args, **kwargs):
+        if GitHubAppAuth.__instance is None:
+            GitHubAppAuth.__instance = super().__new__(cls)
+        return GitHubAppAuth.__instance
+
+    def __init__(self, app_id: str = None, installation_id: str = None, private_key: str = None, base_url: str = None):
+        if not hasattr(self, 'app_id'):
+            self.app_id = app_id or os.getenv('GITHUB_APP_ID')
+            self.installation_id = installation_id or os.getenv('GITHUB_APP_INSTALLATION_ID')
+            self.private_key = private_key or self.read_private_key()
+            self.base_url = base_url or get_api_url()
+            self._authorization: typing.Optional[InstallationAuthorization] = None
+            self._lock = threading.Lock()
+
+    @staticmethod
+    def read_private_key() -> typing.Optional[str]:
+        if os.getenv('GITHUB_APP_PRIVATE_KEY'):
+            return os.getenv('GITHUB_APP_PRIVATE_KEY').replace('\\n', '\n')
+        if os.getenv('GITHUB_APP_PRIVATE_KEY_PATH'):
+            return Path(os.getenv('GITHUB_APP_PRIVATE_KEY_PATH')).expanduser().read_text()
+        return None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.app_id)
+
+    @property
+    def expires_at(self) -> float:
+        if self._authorization is None or self._authorization.expires_at is None:
+            return 0
+        # PyGithub parses timestamps as naive UTC datetimes
+        return calendar.timegm(self._authorization.expires_at.timetuple())
+
+    @property
+    def token(self) -> str:
+        with self._lock:
+            if time.time() >= self.expires_at - self.refresh_margin:
+                self._authorization = self.request_token()
+            return self._authorization.token
+
+    def request_token(self) -> InstallationAuthorization:
+        if not self.installation_id or not self.private_key:
+            raise ValueError(
+                'GitHub App authentication requires GITHUB_APP_INSTALLATION_ID and '
+                'GITHUB_APP_PRIVATE_KEY or GITHUB_APP_PRIVATE_KEY_PATH'
+            )
+
+        integration = GithubIntegration(str(self.app_id), self.private_key, base_url=self.base_url)
+        endpoint = 'POST /app/installations/{installation_id}/access_tokens'
+        with Tracer().span(endpoint, 'api', endpoint=endpoint):
+            authorization = integration.get_access_token(int(self.installation_id))
+        logger.info(f'Requested installation token of GitHub App {self.app_id}, expires at {authorization.expires_at}')
+        return authorization
+
+    def authorize(self, headers: dict, scheme: str = 'token') -> dict:
+        """
+        Request headers with the current installation token, headers are returned as is without an app
+
+        The token is requested on the first authorized request, not when clients are created, so offline runs
+        and loading of configs don't need the API.
+        """
+        if not self.enabled:
+            return headers
+        return {**headers, 'Authorization': f'{scheme} {self.token}'}
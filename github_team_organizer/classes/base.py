@@ -1,21 +1,147 @@
+import logging
+import threading
+import time
 import typing
 import weakref
 from collections import defaultdict
 
+from cached_property import cached_property
+from github.Organization import Organization as PyGithubOrganization
 
-class BaseClass:
+from github_team_organizer.classes.profiler import Profiler
+from github_team_organizer.classes.ratelimit import CallCounter, api_calls
+from github_team_organizer.classes.reporter import Reporter
+from github_team_organizer.classes.sharding import is_in_shard
+from github_team_organizer.classes.tracing import Tracer
 
-    __refs = defaultdict(list)
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateDeclarationError(ValueError):
+    pass
+
+
+class BaseClassMeta(type):
+
+    def __call__(cls, *args, **kwargs):
+        instance = super().__call__(*args, **kwargs)
+        return cls.register(instance)
+
+
+class BaseClass(metaclass=BaseClassMeta):
+    """
+    Registry of declared objects
+
+    Every object is registered under ``(organization, kind, name)`` identity key, declaring the same
+    remote object again returns the already registered instance with the new declaration merged into it.
+    """
+
+    kind = None
+
+    # Cached attributes with the state of the remote object, dropped by ``refresh``
+    remote_attributes = ()
+
+    __refs = defaultdict(dict)
+    __reconciled = set()
+    __reconciled_lock = threading.Lock()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.__refs[self.__class__].append(self)
+
+    def set_organization(self, organization: typing.Union[str, PyGithubOrganization, None]):
+        """
+        Keep the organization login only, so declaring objects needs no API requests
+        """
+        if isinstance(organization, str):
+            self.organization_login = organization
+        elif organization is not None:
+            self.organization_login = organization.login
+            self.organization = organization
+        else:
+            self.organization_login = self.github.default_organization_login
+
+    @cached_property
+    def organization(self) -> PyGithubOrganization:
+        return self.github.get_cached_organization(self.organization_login)
+
+    @property
+    def identity(self) -> typing.Tuple[str, str, str]:
+        return self.organization_login, self.kind, self.name
+
+    @classmethod
+    def register(cls, instance: 'BaseClass') -> 'BaseClass':
+        registry = cls.__refs[cls]
+        existing = registry.setdefault(instance.identity, instance)
+        if existing is not instance:
+            logger.info(f'{"/".join(instance.identity)} is declared more than once, merging declarations')
+            existing.merge(instance)
+        return existing
 
     @classmethod
     def instances(cls) -> typing.List:
-        for instance in cls.__refs.get(cls, []):
+        for instance in list(cls.__refs.get(cls, {}).values()):
             yield instance
 
+    @classmethod
+    def reset_reconciled(cls):
+        cls.__reconciled.clear()
+
+    def refresh(self):
+        """
+        Forget the fetched state of the remote object, so it's requested again by the next reconciliation
+        """
+        for attribute in self.remote_attributes:
+            self.__dict__.pop(attribute, None)
+
+    def merge(self, other: 'BaseClass'):
+        raise DuplicateDeclarationError(f'{"/".join(self.identity)} is declared more than once')
+
+    @property
+    def dependencies(self) -> typing.List['BaseClass']:
+        """
+        Objects which should be reconciled before this one
+        """
+        return []
+
+    @property
+    def is_reconciled(self) -> bool:
+        return self.identity in self.__reconciled
+
+    def reconcile(self):
+        """
+        Run reconciliation of the object unless it was already reconciled during this run
+        or it belongs to another shard
+        """
+        if not is_in_shard(self.identity):
+            return self
+
+        with self.__reconciled_lock:
+            if self.is_reconciled:
+                return self
+            self.__reconciled.add(self.identity)
+
+        counter = CallCounter()
+        token = api_calls.set(counter)
+        started = time.monotonic()
+        error = None
+        try:
+            with Tracer().span('/'.join(self.identity), 'object', kind=self.kind):
+                with Profiler().phase(f'{self.kind}_sync'):
+                    return self.run()
+        except Exception as e:
+            # Failed objects may be reconciled again during the retry pass
+            error = e
+            with self.__reconciled_lock:
+                self.__reconciled.discard(self.identity)
+            raise
+        finally:
+            api_calls.reset(token)
+            Reporter().emit_reconciled(self.identity, time.monotonic() - started, counter.count, error)
+
+    def run(self):
+        raise NotImplementedError
+
 
 class BaseClassWeakRef:
 
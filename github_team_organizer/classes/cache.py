@@ -0,0 +1,93 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir() -> Path:
+    return Path(os.getenv('GITHUB_ORGANIZER_CACHE_DIR') or Path.home() / '.cache' / 'github-team-organizer')
+
+
+class UserCache:
+    """
+    On-disk cache of user IDs by login, shared by runs and processes (SQLite handles locking)
+
+    Unknown logins are cached as well, for a shorter time. Expired entries are not returned,
+    so the users are requested again.
+    """
+
+    ttl = 7 * 24 * 3600
+    negative_ttl = 24 * 3600
+
+    def __init__(self, path: typing.Union[str, Path] = None):
+        self.path = Path(path) if path else get_cache_dir() / 'users.sqlite3'
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> typing.Optional[sqlite3.Connection]:
+        if not hasattr(self._local, 'connection'):
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(str(self.path), timeout=30)
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS users ('
+                    'login TEXT PRIMARY KEY, id TEXT, database_id INTEGER, checked_at REAL NOT NULL)'
+                )
+                connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f'Unable to open user cache {self.path}: {e}')
+                connection = None
+            self._local.connection = connection
+        return self._local.connection
+
+    def get_many(self, logins: typing.Iterable[str]) -> typing.Dict[str, typing.Optional[dict]]:
+        """
+        Cached users by login, ``None`` for logins known to be unknown, missing and expired logins are left out
+        """
+        logins = list(logins)
+        if not logins or self.connection is None:
+            return {}
+
+        now = time.time()
+        users = {}
+        try:
+            for start in range(0, len(logins), 500):
+                batch = logins[start:start + 500]
+                rows = self.connection.execute(
+                    f'SELECT login, id, database_id, checked_at FROM users '
+                    f'WHERE login IN ({", ".join("?" * len(batch))})',
+                    batch,
+                )
+                for login, node_id, database_id, checked_at in rows:
+                    if node_id is None:
+                        if now - checked_at < self.negative_ttl:
+                            users[login] = None
+                    elif now - checked_at < self.ttl:
+                        users[login] = {'id': node_id, 'database_id': database_id}
+        except sqlite3.Error as e:
+            logger.warning(f'Unable to read user cache {self.path}: {e}')
+            return {}
+        return users
+
+    def set_many(self, users: typing.Dict[str, typing.Optional[dict]]):
+        if not users or self.connection is None:
+            return
+
+        now = time.time()
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO users (login, id, database_id, checked_at) VALUES (?, ?, ?, ?)',
+                    [
+                        (login, user['id'] if user else None, user['database_id'] if user else None, now)
+                        for login, user in users.items()
+                    ],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f'Unable to write user cache {self.path}: {e}')
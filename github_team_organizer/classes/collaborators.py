@@ -0,0 +1,111 @@
+import logging
+import typing
+
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.reporter import Reporter
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubCollaboratorScanner:
+    """
+    Org-wide scanner of direct repository collaborators
+
+    Collaborators of several repositories are requested in a single GraphQL query (one aliased
+    ``repository`` field per repository), only repositories with more collaborators than fit
+    into a page are queried again with their cursor.
+    """
+
+    __instances = {}
+
+    batch_size = 25
+    page_size = 100
+
+    def __new__(cls, organization_login: str = None):
+        organization_login = organization_login or GitHubWrapper().default_organization_login
+        if organization_login not in GitHubCollaboratorScanner.__instances:
+            instance = super().__new__(cls)
+            instance.organization_login = organization_login
+            instance.report = {}
+            GitHubCollaboratorScanner.__instances[organization_login] = instance
+        return GitHubCollaboratorScanner.__instances[organization_login]
+
+    def refresh(self):
+        self.report.clear()
+
+    def is_scanned(self, repository_name: str) -> bool:
+        return repository_name in self.report
+
+    def get_collaborators(self, repository_name: str) -> typing.List[str]:
+        return self.report.get(repository_name, [])
+
+    @property
+    def removal_list(self) -> typing.List[typing.Tuple[str, str]]:
+        """
+        Work list of ``(repository name, collaborator login)`` pairs which should be removed
+        """
+        return [
+            (repository_name, login)
+            for repository_name, logins in sorted(self.report.items())
+            for login in logins
+        ]
+
+    def scan(self, repository_names: typing.Iterable[str]):
+        """
+        Fetch direct collaborators for every passed repository
+
+        :param repository_names: short repository names (without organization prefix)
+        :return: self
+        """
+        pending = {name: None for name in repository_names if name not in self.report}
+        for name in pending:
+            self.report[name] = []
+
+        while pending:
+            batch = list(pending.items())[:self.batch_size]
+            op = Operation(schema.Query)
+            for i, (name, cursor) in enumerate(batch):
+                r = op.repository(owner=self.organization_login, name=name, __alias__=f'r{i}')
+                c = r.collaborators(affiliation='DIRECT', first=self.page_size, after=cursor)
+                c.page_info.__fields__('has_next_page', 'end_cursor')
+                c.edges.node.login()
+
+            data = GitHubGraphQL().call(op, allow_partial=True)
+            result = op + data
+
+            for i, (name, _) in enumerate(batch):
+                alias = f'r{i}'
+                if not (data.get('data') or {}).get(alias) or not data['data'][alias].get('collaborators'):
+                    logger.warning(f'Unable to list collaborators of repository {name}, skipping')
+                    pending.pop(name)
+                    self.report.pop(name)
+                    continue
+
+                collaborators = getattr(result, alias).collaborators
+                self.report[name].extend(edge.node.login for edge in collaborators.edges)
+
+                if collaborators.page_info.has_next_page:
+                    pending[name] = collaborators.page_info.end_cursor
+                else:
+                    pending.pop(name)
+
+        return self
+
+    def print_report(self):
+        repositories = {name: logins for name, logins in sorted(self.report.items()) if logins}
+        if not repositories:
+            Reporter().secho(f'No direct collaborators found in {len(self.report)} repositories', fg='green')
+            return
+
+        Reporter().secho(
+            f'Found {len(self.removal_list)} direct collaborators '
+            f'in {len(repositories)} of {len(self.report)} repositories:',
+            bold=True, bg='yellow'
+        )
+        for name, logins in repositories.items():
+            Reporter().secho(f' - {self.organization_login}/{name}: {", ".join(logins)}')
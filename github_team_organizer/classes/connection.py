@@ -0,0 +1,159 @@
+import threading
+import typing
+from collections import OrderedDict
+
+import requests
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, RequestsResponse
+
+from github_team_organizer.classes.appauth import GitHubAppAuth
+from github_team_organizer.classes.profiler import Profiler
+from github_team_organizer.classes.ratelimit import RateLimiter
+from github_team_organizer.classes.tokenpool import TokenPool
+from github_team_organizer.classes.tracing import Tracer
+
+
+class ConditionalRequestCache:
+    """
+    Responses of GET requests kept with their ETags, used in watch mode
+
+    Cached URLs are requested with ``If-None-Match``, GitHub answers ``304 Not Modified`` without a body
+    when nothing changed and such responses don't count against the rate limit. Responses are kept per
+    URL, token and media type, as they depend on all of them, up to ``max_size`` least recently used ones.
+    """
+
+    __instance = None
+
+    max_size = 1000
+
+    def __new__(cls, *args, **kwargs):
+        if ConditionalRequestCache.__instance is None:
+            ConditionalRequestCache.__instance = super().__new__(cls)
+            ConditionalRequestCache.__instance.enabled = False
+            ConditionalRequestCache.__instance.responses = OrderedDict()
+            ConditionalRequestCache.__instance.hits = 0
+            ConditionalRequestCache.__instance._lock = threading.Lock()
+        return ConditionalRequestCache.__instance
+
+    @staticmethod
+    def get_key(url: str, headers: dict) -> typing.Tuple[str, str, str]:
+        return url, headers.get('Authorization'), headers.get('Accept')
+
+    def get(self, key: tuple) -> typing.Optional[RequestsResponse]:
+        with self._lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+            return response
+
+    def prepare(self, url: str, headers: dict) -> dict:
+        response = self.get(self.get_key(url, headers))
+        if response is None:
+            return headers
+        return {**headers, 'If-None-Match': response.headers['etag']}
+
+    def resolve(self, url: str, headers: dict, response: RequestsResponse) -> RequestsResponse:
+        key = self.get_key(url, headers)
+        if response.status == 304:
+            cached = self.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return cached
+        if response.status == 200 and response.headers.get('etag'):
+            with self._lock:
+                self.responses[key] = response
+                self.responses.move_to_end(key)
+                while len(self.responses) > self.max_size:
+                    self.responses.popitem(last=False)
+        return response
+
+
+class ThreadLocalRequestMixin:
+    """
+    PyGithub creates a connection object per request once connection classes are injected, so every
+    connection object uses a session of its protocol shared by the whole process, and keep-alive
+    connections of its pool are reused by all requests and threads. The prepared request is stored
+    on the connection between ``request()`` and ``getresponse()`` calls, it's kept per thread in case
+    a connection object is shared. Every request also passes through the shared rate limiter and is
+    sent with the current GitHub App token, if any, or with a token of the token pool. GET requests
+    are conditional when the conditional cache is enabled.
+    """
+
+    pool_size = 16
+
+    __sessions = {}
+    __sessions_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        super().__init__(*args, **kwargs)
+        self.session = self.get_session(self.protocol, getattr(self, 'retry', 0) or 0)
+
+    @classmethod
+    def get_session(cls, protocol: str, retry) -> requests.Session:
+        with cls.__sessions_lock:
+            if protocol not in cls.__sessions:
+                session = requests.Session()
+                session.mount(f'{protocol}://', requests.adapters.HTTPAdapter(
+                    pool_connections=cls.pool_size,
+                    pool_maxsize=cls.pool_size,
+                    max_retries=retry,
+                ))
+                cls.__sessions[protocol] = session
+            return cls.__sessions[protocol]
+
+    def request(self, verb, url, input, headers):
+        token = None
+        # The GitHub App token takes precedence over the token pool, as in GraphQL requests
+        if GitHubAppAuth().enabled:
+            headers = GitHubAppAuth().authorize(headers)
+        elif TokenPool().enabled and 'Authorization' in headers:
+            token = TokenPool().select('core', write=verb not in ('GET', 'HEAD'))
+            headers = {**headers, 'Authorization': f'token {token}'}
+        if verb == 'GET' and ConditionalRequestCache().enabled:
+            headers = ConditionalRequestCache().prepare(url, headers)
+        self._local.request = (verb, url, input, headers, token)
+
+    def getresponse(self):
+        RateLimiter().acquire('core', self.token)
+        endpoint = f'{self.verb} {self.url.split("?", 1)[0]}'
+        with Tracer().span(endpoint, 'api', endpoint=endpoint, request_size=len(self.input or '')) as span:
+            with Profiler().network():
+                response = super().getresponse()
+            span.set(
+                status=response.status,
+                rate_limit_remaining=response.headers.get('x-ratelimit-remaining'),
+                response_size=len(response.text),
+            )
+        RateLimiter().update('core', response.headers, self.token)
+        if self.verb == 'GET' and ConditionalRequestCache().enabled:
+            response = ConditionalRequestCache().resolve(self.url, self.headers, response)
+        return response
+
+    @property
+    def verb(self):
+        return self._local.request[0]
+
+    @property
+    def url(self):
+        return self._local.request[1]
+
+    @property
+    def input(self):
+        return self._local.request[2]
+
+    @property
+    def headers(self):
+        return self._local.request[3]
+
+    @property
+    def token(self):
+        return self._local.request[4]
+
+
+class ThreadSafeHTTPConnection(ThreadLocalRequestMixin, HTTPRequestsConnectionClass):
+    pass
+
+
+class ThreadSafeHTTPSConnection(ThreadLocalRequestMixin, HTTPSRequestsConnectionClass):
+    pass
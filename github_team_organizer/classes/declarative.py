@@ -0,0 +1,256 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import typing
+from pathlib import Path
+
+from github_team_organizer.classes.cache import get_cache_dir
+from github_team_organizer.classes.hierarchy import TeamHierarchyError, TeamTree
+from github_team_organizer.classes.orgmembers import GitHubOrganizationMembers
+from github_team_organizer.classes.project import GitHubProject
+from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.team import GitHubTeam
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+logger = logging.getLogger(__name__)
+
+# Increase on every change of the intermediate representation, so stale cache entries are ignored
+IR_VERSION = 4
+
+TEAM_FIELDS = {
+    'name': None,
+    'description': '',
+    'privacy': 'closed',
+    'maintainers': [],
+    'members': [],
+    # Parent team name, the parent is not managed when it is not set
+    'parent': None,
+}
+
+MEMBERS_FIELDS = {
+    # Admin roles are not managed when admins are not listed
+    'admins': None,
+    'members': [],
+    'outside_collaborators': [],
+}
+
+REPOSITORY_TEAM_FIELDS = ('admin_teams', 'master_teams', 'push_teams', 'pull_teams', 'triage_teams')
+
+REPOSITORY_FIELDS = {
+    'name': None,
+    **{f: [] for f in REPOSITORY_TEAM_FIELDS},
+    'precreated_branches': [],
+    'protection': {},
+    'default_branch_name': 'master',
+    'master_branch_name': 'master',
+    'auto_cicd_protection_mode': None,
+}
+
+PROJECT_FIELDS = {
+    'name': None,
+    'repositories': [],
+    'repository_defaults': {},
+    'subprojects': [],
+    'master_teams': [],
+    'master_team_members': [],
+    'dev_teams': [],
+    'dev_team_members': [],
+    'qa_teams': [],
+    'qa_team_members': [],
+}
+
+EXTENSIONS = ('.yml', '.yaml', '.toml')
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def is_declarative_config(name: str) -> bool:
+    return name.lower().endswith(EXTENSIONS)
+
+
+def parse(path: Path, content: bytes) -> dict:
+    if path.suffix.lower() == '.toml':
+        if tomllib is None:
+            raise ConfigError('TOML configs require Python 3.11+ or "tomli" package')
+        return tomllib.loads(content.decode('utf-8'))
+
+    if yaml is None:
+        raise ConfigError('YAML configs require "pyyaml" package')
+    return yaml.safe_load(content) or {}
+
+
+def normalize_entry(entry: dict, fields: dict, section: str) -> dict:
+    if not isinstance(entry, dict) or not entry.get('name'):
+        raise ConfigError(f'Every entry of "{section}" should be a mapping with a name: {entry!r}')
+
+    unknown = set(entry) - set(fields)
+    if unknown:
+        raise ConfigError(f'Unknown fields of {section} "{entry["name"]}": {", ".join(sorted(unknown))}')
+
+    return {k: entry.get(k, copy.deepcopy(default)) for k, default in fields.items()}
+
+
+def normalize_members(members: typing.Optional[dict]) -> typing.Optional[dict]:
+    if members is None:
+        return None
+    if not isinstance(members, dict):
+        raise ConfigError(f'Section "members" should be a mapping: {members!r}')
+
+    unknown = set(members) - set(MEMBERS_FIELDS)
+    if unknown:
+        raise ConfigError(f'Unknown fields of members: {", ".join(sorted(unknown))}')
+
+    return {k: members.get(k, copy.deepcopy(default)) for k, default in MEMBERS_FIELDS.items()}
+
+
+def check_team_references(entry: dict, fields: typing.Iterable[str], teams: typing.Set[str], owner: str):
+    for field in fields:
+        for team in entry.get(field) or []:
+            if team not in teams:
+                raise ConfigError(f'{owner} references unknown team "{team}" in {field}')
+
+
+def compile_config(data: dict) -> dict:
+    """
+    Validate parsed config and convert it into a normalized intermediate representation
+    """
+    unknown = set(data) - {'members', 'teams', 'projects', 'repositories'}
+    if unknown:
+        raise ConfigError(f'Unknown config sections: {", ".join(sorted(unknown))}')
+
+    ir = {
+        'version': IR_VERSION,
+        'members': normalize_members(data.get('members')),
+        'teams': [normalize_entry(e, TEAM_FIELDS, 'teams') for e in data.get('teams') or []],
+        'projects': [normalize_entry(e, PROJECT_FIELDS, 'projects') for e in data.get('projects') or []],
+        'repositories': [normalize_entry(e, REPOSITORY_FIELDS, 'repositories') for e in data.get('repositories') or []],
+    }
+
+    teams = {t['name'] for t in ir['teams']}
+    for t in ir['teams']:
+        if t['parent'] is not None and t['parent'] not in teams:
+            raise ConfigError(f'Team "{t["name"]}" references unknown parent team "{t["parent"]}"')
+    try:
+        TeamTree({t['name']: t['parent'] for t in ir['teams']}).get_order()
+    except TeamHierarchyError as e:
+        raise ConfigError(str(e))
+
+    for r in ir['repositories']:
+        check_team_references(r, REPOSITORY_TEAM_FIELDS, teams, f'Repository "{r["name"]}"')
+
+    projects = set()
+    for p in ir['projects']:
+        owner = f'Project "{p["name"]}"'
+        check_team_references(p, ('master_teams', 'dev_teams', 'qa_teams'), teams, owner)
+        if not isinstance(p['repository_defaults'], dict):
+            raise ConfigError(f'{owner} should have a mapping of repository defaults: {p["repository_defaults"]!r}')
+        check_team_references(p['repository_defaults'], REPOSITORY_TEAM_FIELDS, teams, owner)
+        # Repositories of projects are declared by name, so defaults can't set it
+        unknown = set(p['repository_defaults']) - (set(REPOSITORY_FIELDS) - {'name'})
+        if unknown:
+            raise ConfigError(f'{owner} has unknown repository defaults: {", ".join(sorted(unknown))}')
+        for repository in p['repositories']:
+            if not isinstance(repository, str) or not repository:
+                raise ConfigError(f'{owner} should list repositories by name: {repository!r}')
+        for subproject in p['subprojects']:
+            if subproject not in projects:
+                raise ConfigError(f'{owner} references subproject "{subproject}" which is not declared before it')
+        projects.add(p['name'])
+
+    return ir
+
+
+def load_ir(path: typing.Union[str, Path], use_cache: bool = True) -> dict:
+    """
+    Load intermediate representation of the config, compiled configs are cached by content hash
+    """
+    path = Path(path)
+    content = path.read_bytes()
+    digest = hashlib.sha256(b'%d:%s:' % (IR_VERSION, path.suffix.lower().encode()) + content).hexdigest()
+    # The representation is plain data, so it's cached as JSON and nothing is executed on loading it
+    cache_path = get_cache_dir() / f'config-{digest}.json'
+
+    if use_cache and cache_path.exists():
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                ir = json.load(f)
+            if isinstance(ir, dict) and ir.get('version') == IR_VERSION:
+                logger.info(f'Config {path} is loaded from cache {cache_path}')
+                return ir
+        except (OSError, ValueError):
+            logger.warning(f'Config cache {cache_path} is broken, recompiling')
+
+    ir = compile_config(parse(path, content))
+
+    if use_cache:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(ir, f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError) as e:
+            logger.warning(f'Unable to write config cache {cache_path}: {e}')
+
+    return ir
+
+
+def instantiate(ir: dict, organization: str = None) -> dict:
+    """
+    Declare teams, repositories and projects of the intermediate representation
+    """
+    teams = {}
+    for t in ir['teams']:
+        teams[t['name']] = GitHubTeam(
+            name=t['name'],
+            description=t['description'],
+            privacy=t['privacy'],
+            team_maintainers=t['maintainers'],
+            team_members=t['members'],
+            organization=organization,
+        )
+    for t in ir['teams']:
+        if t['parent'] is not None:
+            teams[t['name']].parent_team = teams[t['parent']]
+
+    def with_teams(entry: dict, fields: typing.Iterable[str]) -> dict:
+        return {k: [teams[n] for n in v] if k in fields else v for k, v in entry.items()}
+
+    repositories = [
+        GitHubRepositoryWrapper(organization=organization, **with_teams(r, REPOSITORY_TEAM_FIELDS))
+        for r in ir['repositories']
+    ]
+
+    projects = {}
+    for p in ir['projects']:
+        project = with_teams(p, ('master_teams', 'dev_teams', 'qa_teams'))
+        project['repository_defaults'] = with_teams(p['repository_defaults'], REPOSITORY_TEAM_FIELDS)
+        project['subprojects'] = [projects[n] for n in p['subprojects']]
+        projects[p['name']] = GitHubProject(organization=organization, **project)
+
+    members = None
+    if ir['members'] is not None:
+        members = GitHubOrganizationMembers(organization=organization, **ir['members'])
+
+    return {'members': members, 'teams': teams, 'repositories': repositories, 'projects': projects}
+
+
+def load(path: typing.Union[str, Path], organization: str = None, use_cache: bool = True) -> dict:
+    return instantiate(load_ir(path, use_cache=use_cache), organization)
@@ -0,0 +1,123 @@
+import dataclasses
+import logging
+import typing
+
+from cached_property import cached_property
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class DiscoveredRepository:
+
+    name: str
+    is_archived: bool
+    is_fork: bool
+    default_branch_name: typing.Optional[str]
+    updated_at: str
+
+
+class GitHubRepositoryDiscovery:
+    """
+    Lists all repositories of the organization with a paginated GraphQL query
+
+    Repositories are indexed by name, archived and forked repositories can be skipped entirely,
+    so they are neither scanned nor reconciled later.
+    """
+
+    __instances = {}
+
+    page_size = 100
+
+    def __new__(cls, organization_login: str = None):
+        organization_login = organization_login or GitHubWrapper().default_organization_login
+        if organization_login not in GitHubRepositoryDiscovery.__instances:
+            instance = super().__new__(cls)
+            instance.organization_login = organization_login
+            instance.previous_repositories = None
+            GitHubRepositoryDiscovery.__instances[organization_login] = instance
+        return GitHubRepositoryDiscovery.__instances[organization_login]
+
+    @cached_property
+    def all_repositories(self) -> typing.Dict[str, DiscoveredRepository]:
+        repositories = {}
+        cursor = None
+
+        while True:
+            op = Operation(schema.Query)
+            r = op.organization(login=self.organization_login).repositories(first=self.page_size, after=cursor)
+            r.page_info.__fields__('has_next_page', 'end_cursor')
+            r.nodes.__fields__('name', 'is_archived', 'is_fork', 'updated_at')
+            r.nodes.default_branch_ref.name()
+            data = GitHubGraphQL().call(op)
+            connection = (op + data).organization.repositories
+
+            for node in connection.nodes:
+                repositories[node.name] = DiscoveredRepository(
+                    name=node.name,
+                    is_archived=node.is_archived,
+                    is_fork=node.is_fork,
+                    default_branch_name=node.default_branch_ref.name if node.default_branch_ref else None,
+                    updated_at=str(node.updated_at),
+                )
+
+            if not connection.page_info.has_next_page:
+                break
+            cursor = connection.page_info.end_cursor
+
+        logger.info(f'Discovered {len(repositories)} repositories in {self.organization_login}')
+        return repositories
+
+    def refresh(self):
+        """
+        Discover repositories again, repositories of the previous discovery are kept to find changed ones
+        """
+        if self.is_discovered:
+            self.previous_repositories = self.all_repositories
+        for attribute in ('all_repositories', 'repositories', 'skipped_repositories'):
+            self.__dict__.pop(attribute, None)
+
+    @property
+    def changed_repositories(self) -> typing.Set[str]:
+        """
+        Names of repositories updated (by ``updatedAt``), created or removed since the previous discovery
+        """
+        previous = self.previous_repositories
+        if previous is None:
+            return set(self.all_repositories)
+        return {
+            name for name in previous.keys() | self.all_repositories.keys()
+            if name not in previous or name not in self.all_repositories
+            or previous[name].updated_at != self.all_repositories[name].updated_at
+        }
+
+    @property
+    def is_discovered(self) -> bool:
+        return 'all_repositories' in self.__dict__
+
+    def is_skipped(self, repository: DiscoveredRepository) -> bool:
+        return (settings.skip_archived and repository.is_archived) or (settings.skip_forks and repository.is_fork)
+
+    def is_skipped_name(self, name: str) -> bool:
+        """
+        Check if repository was skipped by filters, repositories are never skipped before discovery
+        """
+        return self.is_discovered and name in self.skipped_repositories
+
+    @cached_property
+    def repositories(self) -> typing.Dict[str, DiscoveredRepository]:
+        """
+        Discovered repositories which were not skipped by archived/fork filters
+        """
+        return {name: r for name, r in self.all_repositories.items() if not self.is_skipped(r)}
+
+    @cached_property
+    def skipped_repositories(self) -> typing.Dict[str, DiscoveredRepository]:
+        return {name: r for name, r in self.all_repositories.items() if self.is_skipped(r)}
@@ -0,0 +1,222 @@
+import logging
+import typing
+
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.collaborators import GitHubCollaboratorScanner
+from github_team_organizer.classes.discovery import GitHubRepositoryDiscovery
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.membership import GitHubTeamMembership
+from github_team_organizer.classes.snapshot import ProtectionRuleSnapshot, RepositorySnapshot, TeamSnapshot
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+# GraphQL repository permissions and team privacy values as they are named in REST API
+PERMISSIONS = {'ADMIN': 'admin', 'MAINTAIN': 'maintain', 'WRITE': 'push', 'TRIAGE': 'triage', 'READ': 'pull'}
+PRIVACY = {'SECRET': 'secret', 'VISIBLE': 'closed'}
+
+PROTECTION_FIELDS = (
+    'requires_approving_reviews',
+    'required_approving_review_count',
+    'requires_commit_signatures',
+    'is_admin_enforced',
+    'dismisses_stale_reviews',
+    'requires_code_owner_reviews',
+    'requires_status_checks',
+    'requires_strict_status_checks',
+    'required_status_check_contexts',
+    'restricts_review_dismissals',
+    'restricts_pushes',
+)
+
+
+def select_actor_ids(connection):
+    connection.page_info.__fields__('has_next_page', 'end_cursor')
+    actor = connection.nodes.actor
+    actor.__as__(schema.Team).id()
+    actor.__as__(schema.User).id()
+
+
+def get_actor_ids(connection) -> typing.List[str]:
+    return [node.actor.id for node in connection.nodes if node.actor and getattr(node.actor, 'id', None)]
+
+
+class SnapshotExporter:
+    """
+    Fetches the state of an organization: teams with members and repository permissions,
+    repositories with direct collaborators and branch protection rules
+    """
+
+    teams_page_size = 25
+    repositories_page_size = 25
+    page_size = 100
+    # GraphQL API rejects queries which may return more than 500,000 nodes, repositories with more rules
+    # and rules with more allowances than fit in the first page are completed with follow-up queries
+    rules_page_size = 25
+    allowances_page_size = 10
+
+    def __init__(self, organization_login: str):
+        self.organization_login = organization_login
+
+    def fetch_teams(self) -> typing.Iterator[TeamSnapshot]:
+        """
+        Teams with members and repositories, oversized connections of a team are followed up separately
+        """
+        cursor = None
+        while True:
+            op = Operation(schema.Query)
+            teams = op.organization(login=self.organization_login).teams(first=self.teams_page_size, after=cursor)
+            teams.page_info.__fields__('has_next_page', 'end_cursor')
+            teams.nodes.__fields__('id', 'slug', 'name', 'description', 'privacy')
+            teams.nodes.parent_team.slug()
+            GitHubTeamMembership.select_members(teams.nodes.members(first=self.page_size, membership='IMMEDIATE'))
+            self.select_repositories(teams.nodes.repositories(first=self.page_size))
+            connection = (op + GitHubGraphQL().call(op)).organization.teams
+
+            for node in connection.nodes:
+                team = TeamSnapshot(
+                    slug=node.slug,
+                    name=node.name,
+                    description=node.description or '',
+                    privacy=PRIVACY.get(node.privacy, str(node.privacy).lower()),
+                    node_id=node.id,
+                    parent=node.parent_team.slug if node.parent_team else None,
+                )
+                team.members.update(GitHubTeamMembership.read_members(node.members))
+                if node.members.page_info.has_next_page:
+                    team.members.update(self.fetch_team_members(node.slug, node.members.page_info.end_cursor))
+
+                repositories = dict(self.read_repositories(node.repositories))
+                if node.repositories.page_info.has_next_page:
+                    repositories.update(self.fetch_team_repositories(node.slug, node.repositories.page_info.end_cursor))
+                team.repositories = repositories
+                yield team
+
+            if not connection.page_info.has_next_page:
+                break
+            cursor = connection.page_info.end_cursor
+
+    @staticmethod
+    def select_repositories(repositories):
+        repositories.page_info.__fields__('has_next_page', 'end_cursor')
+        repositories.edges.permission()
+        repositories.edges.node.name()
+
+    @staticmethod
+    def read_repositories(repositories) -> typing.Iterator[typing.Tuple[str, str]]:
+        for edge in repositories.edges:
+            yield edge.node.name, PERMISSIONS.get(edge.permission, str(edge.permission).lower())
+
+    def fetch_team_members(self, slug: str, cursor: str) -> typing.Dict[str, str]:
+        members = {}
+        while cursor:
+            op = Operation(schema.Query)
+            team = op.organization(login=self.organization_login).team(slug=slug)
+            GitHubTeamMembership.select_members(
+                team.members(first=self.page_size, after=cursor, membership='IMMEDIATE')
+            )
+            connection = (op + GitHubGraphQL().call(op)).organization.team.members
+            members.update(GitHubTeamMembership.read_members(connection))
+            cursor = connection.page_info.end_cursor if connection.page_info.has_next_page else None
+        return members
+
+    def fetch_team_repositories(self, slug: str, cursor: str) -> typing.Dict[str, str]:
+        repositories = {}
+        while cursor:
+            op = Operation(schema.Query)
+            team = op.organization(login=self.organization_login).team(slug=slug)
+            self.select_repositories(team.repositories(first=self.page_size, after=cursor))
+            connection = (op + GitHubGraphQL().call(op)).organization.team.repositories
+            repositories.update(self.read_repositories(connection))
+            cursor = connection.page_info.end_cursor if connection.page_info.has_next_page else None
+        return repositories
+
+    def fetch_repositories(self, teams: typing.Iterable[TeamSnapshot] = ()) -> typing.Iterator[RepositorySnapshot]:
+        """
+        Repositories with protection rules, team permissions are taken from already fetched teams
+        """
+        team_permissions = {}
+        for team in teams:
+            for name, permission in team.repositories.items():
+                team_permissions.setdefault(name, {})[team.slug] = permission
+
+        discovery = GitHubRepositoryDiscovery(self.organization_login)
+        scanner = GitHubCollaboratorScanner(self.organization_login).scan(discovery.all_repositories.keys())
+
+        cursor = None
+        while True:
+            op = Operation(schema.Query)
+            repositories = op.organization(login=self.organization_login).repositories(
+                first=self.repositories_page_size, after=cursor
+            )
+            repositories.page_info.__fields__('has_next_page', 'end_cursor')
+            repositories.nodes.name()
+            self.select_rules(repositories.nodes.branch_protection_rules(first=self.rules_page_size))
+            connection = (op + GitHubGraphQL().call(op)).organization.repositories
+
+            for node in connection.nodes:
+                discovered = discovery.all_repositories.get(node.name)
+                repository = RepositorySnapshot(
+                    name=node.name,
+                    is_archived=discovered.is_archived if discovered else False,
+                    is_fork=discovered.is_fork if discovered else False,
+                    default_branch_name=discovered.default_branch_name if discovered else None,
+                    updated_at=discovered.updated_at if discovered else None,
+                    teams=team_permissions.get(node.name, {}),
+                    collaborators=scanner.get_collaborators(node.name),
+                )
+                rules = node.branch_protection_rules
+                for rule in self.read_rules(rules):
+                    repository.protection_rules[rule.pattern] = rule
+                if rules.page_info.has_next_page:
+                    repository.protection_rules.update(
+                        self.fetch_repository_rules(node.name, rules.page_info.end_cursor)
+                    )
+                yield repository
+
+            if not connection.page_info.has_next_page:
+                break
+            cursor = connection.page_info.end_cursor
+
+    def select_rules(self, rules):
+        rules.page_info.__fields__('has_next_page', 'end_cursor')
+        rules.nodes.__fields__('id', 'pattern', *PROTECTION_FIELDS)
+        select_actor_ids(rules.nodes.push_allowances(first=self.allowances_page_size))
+        select_actor_ids(rules.nodes.review_dismissal_allowances(first=self.allowances_page_size))
+
+    def read_rules(self, rules) -> typing.Iterator[ProtectionRuleSnapshot]:
+        for rule in rules.nodes:
+            settings = {field: getattr(rule, field) for field in PROTECTION_FIELDS}
+            for field, allowances in (
+                ('push_actor_ids', 'push_allowances'),
+                ('review_dismissal_actor_ids', 'review_dismissal_allowances'),
+            ):
+                connection = getattr(rule, allowances)
+                settings[field] = get_actor_ids(connection)
+                if connection.page_info.has_next_page:
+                    settings[field] += self.fetch_rule_actor_ids(rule.id, allowances, connection.page_info.end_cursor)
+            yield ProtectionRuleSnapshot(pattern=rule.pattern, node_id=rule.id, settings=settings)
+
+    def fetch_repository_rules(self, name: str, cursor: str) -> typing.Dict[str, ProtectionRuleSnapshot]:
+        rules = {}
+        while cursor:
+            op = Operation(schema.Query)
+            repository = op.organization(login=self.organization_login).repository(name=name)
+            self.select_rules(repository.branch_protection_rules(first=self.rules_page_size, after=cursor))
+            connection = (op + GitHubGraphQL().call(op)).organization.repository.branch_protection_rules
+            rules.update((rule.pattern, rule) for rule in self.read_rules(connection))
+            cursor = connection.page_info.end_cursor if connection.page_info.has_next_page else None
+        return rules
+
+    def fetch_rule_actor_ids(self, rule_id: str, allowances: str, cursor: str) -> typing.List[str]:
+        actor_ids = []
+        while cursor:
+            op = Operation(schema.Query)
+            rule = op.node(id=rule_id).__as__(schema.BranchProtectionRule)
+            select_actor_ids(getattr(rule, allowances)(first=self.page_size, after=cursor))
+            connection = getattr((op + GitHubGraphQL().call(op)).node, allowances)
+            actor_ids += get_actor_ids(connection)
+            cursor = connection.page_info.end_cursor if connection.page_info.has_next_page else None
+        return actor_ids
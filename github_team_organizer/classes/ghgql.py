@@ -1,21 +1,45 @@
-import click
+import json
+import logging
+import urllib.error
+import urllib.request
+
 from cached_property import cached_property
 from sgqlc.endpoint.http import HTTPEndpoint
 
+from github_team_organizer.classes.appauth import GitHubAppAuth, get_graphql_url
 from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.profiler import Profiler
+from github_team_organizer.classes.ratelimit import RateLimiter
+from github_team_organizer.classes.tokenpool import TokenPool
+from github_team_organizer.classes.tracing import Tracer
+
+
+logger = logging.getLogger(__name__)
+
+
+class GraphQLError(Exception):
+    """
+    GraphQL request failed or returned errors
+    """
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        super().__init__('; '.join(str(e.get('message', e)) if isinstance(e, dict) else str(e) for e in errors))
 
 
 class GitHubGraphQL:
 
     __instance = None
 
-    url = 'https://api.github.com/graphql'
-
     def __new__(cls, *args, **kwargs):
         if GitHubGraphQL.__instance is None:
             GitHubGraphQL.__instance = super().__new__(cls, *args, **kwargs)
         return GitHubGraphQL.__instance
 
+    @cached_property
+    def url(self) -> str:
+        return get_graphql_url()
+
     @cached_property
     def headers(self):
         return {
@@ -24,12 +48,48 @@ class GitHubGraphQL:
 
     @cached_property
     def endpoint(self):
-        return HTTPEndpoint(self.url, self.headers)
+        return HTTPEndpoint(self.url, self.headers, urlopen=self.urlopen)
+
+    @staticmethod
+    def urlopen(request: urllib.request.Request, *args, **kwargs):
+        token = None
+        if GitHubAppAuth().enabled:
+            request.add_header('Authorization', f'bearer {GitHubAppAuth().token}')
+        elif TokenPool().enabled:
+            query = json.loads(request.data or b'{}').get('query') or ''
+            token = TokenPool().select('graphql', write=query.lstrip().startswith('mutation'))
+            request.add_header('Authorization', f'bearer {token}')
+        RateLimiter().acquire('graphql', token)
+        endpoint = f'{request.get_method()} {request.selector}'
+        with Tracer().span(endpoint, 'api', endpoint=endpoint, request_size=len(request.data or b'')) as span:
+            try:
+                with Profiler().network():
+                    response = urllib.request.urlopen(request, *args, **kwargs)
+            except urllib.error.HTTPError as e:
+                span.set(status=e.code, rate_limit_remaining=e.headers.get('X-RateLimit-Remaining'))
+                RateLimiter().update('graphql', e.headers, token)
+                raise
+            span.set(
+                status=response.status,
+                rate_limit_remaining=response.headers.get('X-RateLimit-Remaining'),
+                response_size=int(response.headers.get('Content-Length') or 0),
+            )
+        RateLimiter().update('graphql', response.headers, token)
+        return response
+
+    def call(self, *args, allow_partial: bool = False, **kwargs):
+        """
+        Execute the operation, errors are raised as ``GraphQLError``
 
-    def call(self, *args, **kwargs):
+        :param allow_partial: return partial data along with errors, e.g. for batched queries
+            where every aliased field is checked by the caller
+        """
         result = self.endpoint(*args, **kwargs)
 
         if result.get('errors'):
-            click.secho(f'Error occured: {result}', bg='yellow')
-            exit(1)
+            if allow_partial and result.get('data'):
+                for error in result['errors']:
+                    logger.info(f'GraphQL error: {error.get("message", error)}')
+                return result
+            raise GraphQLError(result['errors'])
         return result
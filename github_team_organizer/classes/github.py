@@ -1,8 +1,23 @@
+import contextvars
 import os
+import threading
+import typing
 
-from cached_property import cached_property
 from github import Github as PyGithub
+from github.NamedUser import NamedUser
 from github.Organization import Organization
+from github.Requester import Requester
+from github.Team import Team
+
+from github_team_organizer.classes.appauth import get_api_url
+from github_team_organizer.classes.connection import ThreadSafeHTTPConnection, ThreadSafeHTTPSConnection
+from github_team_organizer.classes.pagination import fetch_all
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.classes.tokenpool import TokenPool
+
+
+# Login of the organization which is currently configured/reconciled, set per organization context
+organization_login = contextvars.ContextVar('organization_login', default=None)
 
 
 class GitHubWrapper(PyGithub):
@@ -16,10 +31,53 @@ class GitHubWrapper(PyGithub):
 
     def __init__(self, login_or_token: str = None):
         if not hasattr(self, 'login_or_token'):
-            self.login_or_token = login_or_token or os.getenv('GITHUB_API_KEY')
+            # With a GitHub App requests are sent with the current installation token and with several tokens
+            # with tokens selected by the pool, both are added per request by ThreadLocalRequestMixin
+            self.login_or_token = login_or_token or next(iter(TokenPool().tokens), None)
+            self._organizations: typing.Dict[str, Organization] = {}
+            self._organizations_lock = threading.Lock()
+
+            # A single requester (and so a single connection pool) is shared by every caller of the singleton
+            Requester.injectConnectionClasses(ThreadSafeHTTPConnection, ThreadSafeHTTPSConnection)
+            super().__init__(login_or_token=self.login_or_token, base_url=get_api_url(), per_page=settings.per_page)
+            self._teams: typing.Dict[str, typing.Dict[str, Team]] = {}
+            self._teams_lock = threading.Lock()
 
-        super().__init__(login_or_token=self.login_or_token)
+    @property
+    def default_organization_login(self) -> str:
+        return organization_login.get() or os.getenv('GITHUB_ORGANIZATION')
 
-    @cached_property
+    @property
     def default_organization(self) -> Organization:
-        return self.get_organization(os.getenv('GITHUB_ORGANIZATION'))
+        return self.get_cached_organization(self.default_organization_login)
+
+    def get_cached_organization(self, login: str) -> Organization:
+        with self._organizations_lock:
+            if login not in self._organizations:
+                self._organizations[login] = self.get_organization(login)
+            return self._organizations[login]
+
+    def get_cached_teams(self, login: str) -> typing.Dict[str, Team]:
+        """
+        All teams of the organization by name, listed once with pages requested in parallel
+        """
+        organization = self.get_cached_organization(login)
+        with self._teams_lock:
+            if login not in self._teams:
+                self._teams[login] = {team.name: team for team in fetch_all(organization.get_teams())}
+            return self._teams[login]
+
+    def refresh(self, login: str):
+        """
+        Forget listed teams of the organization, so they are listed again
+        """
+        with self._teams_lock:
+            self._teams.pop(login, None)
+
+    def get_lazy_user(self, login: str) -> NamedUser:
+        """
+        User object which is not requested from the API until one of its attributes is accessed
+        """
+        return NamedUser(
+            self._Github__requester, {}, {'login': login, 'url': f'/users/{login}'}, completed=False
+        )
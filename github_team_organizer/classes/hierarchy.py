@@ -0,0 +1,86 @@
+import typing
+from collections import defaultdict
+
+
+# REST permission names from the weakest to the strongest one
+PERMISSION_LEVELS = ('pull', 'triage', 'push', 'maintain', 'admin')
+
+
+class TeamHierarchyError(ValueError):
+    pass
+
+
+def strongest_permission(*permissions: str) -> str:
+    return max(permissions, key=lambda p: PERMISSION_LEVELS.index(p) if p in PERMISSION_LEVELS else -1)
+
+
+class TeamTree:
+    """
+    Parent-child relations of teams of an organization, built once and kept in memory
+
+    Child teams inherit repository access of all their ancestors, effective permissions are computed
+    in a single pass from root teams down to the leaves.
+    """
+
+    def __init__(self, parents: typing.Dict[str, typing.Optional[str]]):
+        self.parents = dict(parents)
+        self.children = defaultdict(list)
+        for slug, parent in sorted(self.parents.items()):
+            if parent is not None:
+                self.children[parent].append(slug)
+
+    @classmethod
+    def from_snapshot(cls, organization_snapshot) -> 'TeamTree':
+        return cls({slug: team.parent for slug, team in organization_snapshot.teams.items()})
+
+    def get_parent(self, slug: str) -> typing.Optional[str]:
+        return self.parents.get(slug)
+
+    def get_ancestors(self, slug: str) -> typing.List[str]:
+        """
+        Ancestors of the team, the nearest first
+        """
+        ancestors = []
+        parent = self.parents.get(slug)
+        while parent is not None:
+            if parent == slug or parent in ancestors:
+                raise TeamHierarchyError(f'Team {slug} is its own ancestor')
+            ancestors.append(parent)
+            parent = self.parents.get(parent)
+        return ancestors
+
+    def get_order(self) -> typing.List[str]:
+        """
+        All teams ordered so that every parent goes before its children
+        """
+        slugs = set(self.parents) | set(self.children)
+        order = [slug for slug in sorted(slugs) if self.parents.get(slug) is None]
+        for slug in order:
+            order.extend(self.children[slug])
+
+        if len(order) != len(slugs):
+            blocked = ', '.join(sorted(slugs - set(order)))
+            raise TeamHierarchyError(f'Cycle in team hierarchy between: {blocked}')
+        return order
+
+    def get_effective_permissions(
+            self, permissions: typing.Dict[str, typing.Dict[str, str]]
+    ) -> typing.Dict[str, typing.Dict[str, str]]:
+        """
+        Repository permissions of every team including ones inherited from its ancestors
+
+        :param permissions: team slug -> repository name -> permission granted to the team directly
+        """
+        effective = {}
+        for slug in self.get_order():
+            inherited = effective.get(self.parents.get(slug), {})
+            team_permissions = dict(inherited)
+            for repository, permission in permissions.get(slug, {}).items():
+                if repository in team_permissions:
+                    permission = strongest_permission(team_permissions[repository], permission)
+                team_permissions[repository] = permission
+            effective[slug] = team_permissions
+
+        for slug in permissions.keys() - effective.keys():
+            effective[slug] = dict(permissions[slug])
+        return effective
@@ -0,0 +1,129 @@
+import logging
+import threading
+import typing
+
+from cached_property import threaded_cached_property
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.hierarchy import TeamTree
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubTeamMembership:
+    """
+    Org-wide fetcher of immediate team members with their roles and of parents of teams
+
+    Members of many teams are requested in a single GraphQL query (``organization.teams`` with
+    a page of ``members`` per team), only teams with more members than fit into a page are queried
+    again with their cursor, several such teams per query (one aliased ``team`` field per team).
+    """
+
+    __instances = {}
+
+    teams_page_size = 50
+    page_size = 100
+    batch_size = 25
+
+    def __new__(cls, organization_login: str = None):
+        organization_login = organization_login or GitHubWrapper().default_organization_login
+        if organization_login not in GitHubTeamMembership.__instances:
+            instance = super().__new__(cls)
+            instance.organization_login = organization_login
+            instance.members = {}
+            instance.parents = {}
+            instance.fetched = False
+            instance._lock = threading.Lock()
+            GitHubTeamMembership.__instances[organization_login] = instance
+        return GitHubTeamMembership.__instances[organization_login]
+
+    def refresh(self):
+        with self._lock:
+            self.members = {}
+            self.parents = {}
+            self.fetched = False
+            self.__dict__.pop('tree', None)
+
+    def is_fetched(self) -> bool:
+        return self.fetched
+
+    @threaded_cached_property
+    def tree(self) -> TeamTree:
+        return TeamTree(self.fetch().parents)
+
+    def get_members(self, slug: str, role: str) -> typing.List[str]:
+        """
+        Lowercase logins of team members with the role, ``'member'`` or ``'maintainer'``
+        """
+        return [login for login, member_role in self.members.get(slug, {}).items() if member_role == role]
+
+    @staticmethod
+    def select_members(members):
+        members.page_info.__fields__('has_next_page', 'end_cursor')
+        members.edges.role()
+        members.edges.node.login()
+
+    @staticmethod
+    def read_members(members) -> typing.Iterator[typing.Tuple[str, str]]:
+        for edge in members.edges:
+            yield edge.node.login.lower(), str(edge.role).lower()
+
+    def fetch(self):
+        """
+        Fetch members and parents of all teams of the organization
+
+        :return: self
+        """
+        with self._lock:
+            if self.fetched:
+                return self
+
+            pending = {}
+            cursor = None
+            while True:
+                op = Operation(schema.Query)
+                teams = op.organization(login=self.organization_login).teams(first=self.teams_page_size, after=cursor)
+                teams.page_info.__fields__('has_next_page', 'end_cursor')
+                teams.nodes.slug()
+                teams.nodes.parent_team.slug()
+                self.select_members(teams.nodes.members(first=self.page_size, membership='IMMEDIATE'))
+                connection = (op + GitHubGraphQL().call(op)).organization.teams
+
+                for node in connection.nodes:
+                    self.members[node.slug] = dict(self.read_members(node.members))
+                    self.parents[node.slug] = node.parent_team.slug if node.parent_team else None
+                    if node.members.page_info.has_next_page:
+                        pending[node.slug] = node.members.page_info.end_cursor
+
+                if not connection.page_info.has_next_page:
+                    break
+                cursor = connection.page_info.end_cursor
+
+            self.fetch_pending(pending)
+            self.fetched = True
+        return self
+
+    def fetch_pending(self, pending: typing.Dict[str, str]):
+        """
+        Follow up oversized teams, ``pending`` maps team slugs to cursors of their next pages
+        """
+        while pending:
+            batch = list(pending.items())[:self.batch_size]
+            op = Operation(schema.Query)
+            organization = op.organization(login=self.organization_login)
+            for i, (slug, cursor) in enumerate(batch):
+                team = organization.team(slug=slug, __alias__=f't{i}')
+                self.select_members(team.members(first=self.page_size, after=cursor, membership='IMMEDIATE'))
+            result = (op + GitHubGraphQL().call(op)).organization
+
+            for i, (slug, _) in enumerate(batch):
+                members = getattr(result, f't{i}').members
+                self.members[slug].update(self.read_members(members))
+                if members.page_info.has_next_page:
+                    pending[slug] = members.page_info.end_cursor
+                else:
+                    pending.pop(slug)
@@ -0,0 +1,185 @@
+import logging
+import typing
+from fnmatch import fnmatch
+
+from github.GithubObject import NotSet
+
+from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.collaborators import GitHubCollaboratorScanner
+from github_team_organizer.classes.discovery import DiscoveredRepository, GitHubRepositoryDiscovery
+from github_team_organizer.classes.hierarchy import TeamTree
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.sharding import is_in_shard
+from github_team_organizer.classes.snapshot import OrganizationSnapshot, Snapshot
+from github_team_organizer.classes.team import GitHubTeam
+
+
+logger = logging.getLogger(__name__)
+
+PERMISSIONS = ('admin', 'push', 'pull', 'triage')
+
+
+def load_organization(organization: OrganizationSnapshot):
+    """
+    Fill discovery and collaborator reports of the organization from the snapshot instead of the API
+    """
+    discovery = GitHubRepositoryDiscovery(organization.login)
+    discovery.__dict__['all_repositories'] = {
+        name: DiscoveredRepository(
+            name=name,
+            is_archived=r.is_archived,
+            is_fork=r.is_fork,
+            default_branch_name=r.default_branch_name,
+            updated_at=r.updated_at,
+        )
+        for name, r in organization.repositories.items()
+    }
+
+    scanner = GitHubCollaboratorScanner(organization.login)
+    for name in discovery.repositories:
+        if is_in_shard((organization.login, 'repository', name)):
+            scanner.report[name] = list(organization.repositories[name].collaborators)
+
+    return discovery
+
+
+class OfflinePlanner:
+    """
+    Computes the plan of changes against a saved snapshot, without any API requests
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.trees = {}
+        self.slugs = {}
+
+    def get_tree(self, organization_login: str) -> TeamTree:
+        if organization_login not in self.trees:
+            self.trees[organization_login] = TeamTree.from_snapshot(self.snapshot.get_organization(organization_login))
+        return self.trees[organization_login]
+
+    def get_slug(self, organization_login: str, name: str) -> typing.Optional[str]:
+        """
+        Slug of the team declared by the name, snapshots are keyed by slugs which differ from names with spaces,
+        capital letters or slashes
+        """
+        if organization_login not in self.slugs:
+            teams = self.snapshot.get_organization(organization_login).teams
+            self.slugs[organization_login] = {team.name: slug for slug, team in teams.items()}
+        return self.slugs[organization_login].get(name)
+
+    def run(self, objects: typing.Iterable[BaseClass]):
+        for obj in objects:
+            if not is_in_shard(obj.identity):
+                continue
+            if isinstance(obj, GitHubTeam):
+                self.plan_team(obj)
+            elif isinstance(obj, GitHubRepositoryWrapper):
+                self.plan_repository(obj)
+        return self
+
+    def plan_team(self, team: GitHubTeam):
+        organization = self.snapshot.get_organization(team.organization_login)
+        slug = self.get_slug(team.organization_login, team.name)
+        actual = organization.teams.get(slug)
+
+        if team.parent_team is not NotSet:
+            actual_parent = self.get_tree(team.organization_login).get_parent(slug) if slug else None
+            # A parent which doesn't exist yet has no slug and can't be the actual parent
+            declared_parent = team.parent_name and (
+                self.get_slug(team.organization_login, team.parent_name) or team.parent_name
+            )
+            if actual_parent != declared_parent:
+                Plan().record(
+                    team.identity, 'set_parent', before={'parent': actual_parent}, after={'parent': team.parent_name},
+                    parent=team.parent_name,
+                )
+
+        if actual is None:
+            Plan().record(team.identity, 'create_team')
+            for role, logins in (('maintainer', team.team_maintainers), ('member', team.team_members)):
+                for login in logins:
+                    Plan().record(team.identity, 'add_member', role=role, login=login)
+            return
+
+        privacy = team.privacy if isinstance(team.privacy, str) else actual.privacy
+        if actual.description != team.description or actual.privacy != privacy:
+            Plan().record(
+                team.identity, 'update_team',
+                before={'description': actual.description, 'privacy': actual.privacy},
+                after={'description': team.description, 'privacy': privacy},
+                description=team.description, privacy=privacy,
+            )
+
+        for role, declared in (('maintainer', team.team_maintainers), ('member', team.team_members)):
+            actual_members = [login.lower() for login in actual.get_members(role)]
+            for login in actual_members:
+                if login not in declared:
+                    Plan().record(team.identity, 'remove_member', role=role, login=login)
+            for login in declared:
+                if login not in actual_members:
+                    Plan().record(team.identity, 'add_member', role=role, login=login)
+
+    def plan_repository(self, repository: GitHubRepositoryWrapper):
+        organization = self.snapshot.get_organization(repository.organization_login)
+        if GitHubRepositoryDiscovery(repository.organization_login).is_skipped_name(repository.name):
+            return
+
+        actual = organization.repositories.get(repository.name)
+        if actual is None:
+            logger.warning(f'Repository {repository.full_name} is not found in the snapshot')
+            Plan().record(repository.identity, 'missing_repository')
+            return
+
+        for login in actual.collaborators:
+            Plan().record(repository.identity, 'remove_collaborator', login=login)
+
+        declared_teams = {
+            'admin': repository.admin_teams,
+            'push': [x for x in repository.master_teams + repository.push_teams if x not in repository.admin_teams],
+            'pull': repository.pull_teams,
+            'triage': repository.triage_teams,
+        }
+        for permission in PERMISSIONS:
+            # Teams are compared by slugs and reported by names, teams which don't exist yet have no slug
+            declared = {
+                self.get_slug(repository.organization_login, t.name) or t.name: t.name
+                for t in declared_teams[permission]
+            }
+            actual_teams = {
+                slug: organization.teams[slug].name if slug in organization.teams else slug
+                for slug, p in actual.teams.items() if p == permission
+            }
+            for slug, name in actual_teams.items():
+                if slug not in declared:
+                    Plan().record(repository.identity, 'remove_team', team=name, permission=permission)
+            for slug, name in declared.items():
+                if slug not in actual_teams:
+                    Plan().record(repository.identity, 'add_team', team=name, permission=permission)
+
+        self.plan_protection(repository, organization, actual)
+
+    def plan_protection(self, repository: GitHubRepositoryWrapper, organization: OrganizationSnapshot, actual):
+        slugs = [self.get_slug(repository.organization_login, t.name) for t in repository.master_teams]
+        master_team_ids = [organization.teams[slug].node_id for slug in slugs if slug in organization.teams]
+
+        for pattern, declared in repository.get_protection(actor_ids=master_team_ids).items():
+            if fnmatch(repository.master_branch_name, pattern):
+                declared = declared.extend('push_actor_ids', master_team_ids)
+
+            rule = actual.protection_rules.get(pattern)
+            if rule is None or any(
+                    not self.is_equal(value, rule.settings.get(key)) for key, value in declared.items()
+            ):
+                Plan().record(repository.identity, 'apply_protection', pattern=pattern)
+
+        for pattern in actual.protection_rules:
+            if pattern not in repository.get_protection(actor_ids=master_team_ids):
+                Plan().record(repository.identity, 'remove_protection', pattern=pattern)
+
+    @staticmethod
+    def is_equal(declared, actual) -> bool:
+        if isinstance(declared, (list, tuple, set, frozenset)):
+            return set(declared) == set(actual or [])
+        return declared == actual
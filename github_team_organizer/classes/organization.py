@@ -6,14 +6,17 @@ from github_team_organizer.classes.github import GitHubWrapper
 
 class Organization:
 
-    __instance = None
+    __instances = {}
 
-    def __new__(cls, *args, **kwargs):
-        if Organization.__instance is None:
-            Organization.__instance = super().__new__(cls, *args, **kwargs)
-        return Organization.__instance
+    def __new__(cls, name: str, *args, **kwargs):
+        if name not in Organization.__instances:
+            Organization.__instances[name] = super().__new__(cls)
+        return Organization.__instances[name]
 
     def __init__(self, name: str, github: PyGithub = None):
+        if hasattr(self, 'github_organization'):
+            return
+
         if not github:
             github = GitHubWrapper()
 
@@ -0,0 +1,175 @@
+import logging
+import typing
+from functools import partial
+
+from github import Github as PyGithub
+from github.Organization import Organization
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.pagination import fetch_all
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.resolver import GitHubUserResolver
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.classes.team import GitHubTeam
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubOrganizationMembers(BaseClass):
+    """
+    Organization members, admins, pending invitations and outside collaborators
+
+    Members of all declared teams of the organization are kept, along with listed admins and members,
+    everybody else is removed. Admin roles are managed only when admins are listed.
+    """
+
+    kind = 'members'
+
+    page_size = 100
+
+    def __init__(
+            self,
+
+            admins: typing.List[str] = None,
+            members: typing.List[str] = None,
+            outside_collaborators: typing.List[str] = None,
+
+            github: PyGithub = None,
+            organization: typing.Union[str, Organization] = None
+    ):
+        super().__init__()
+
+        self.github = github or GitHubWrapper()
+        self.set_organization(organization)
+        self.name = self.organization_login
+
+        self.admins = None if admins is None else [login.lower() for login in admins]
+        self.members = [login.lower() for login in members or []]
+        self.outside_collaborators = [login.lower() for login in outside_collaborators or []]
+
+    @property
+    def teams(self) -> typing.List[GitHubTeam]:
+        return [t for t in GitHubTeam.instances() if t.organization_login == self.organization_login]
+
+    @property
+    def dependencies(self) -> typing.List[GitHubTeam]:
+        # Teams invite their new members themselves, so invitations are fetched after teams are reconciled
+        return self.teams
+
+    def merge(self, other: 'GitHubOrganizationMembers'):
+        if other.admins is not None:
+            self.admins = sorted(set(self.admins or []) | set(other.admins))
+        self.members.extend(login for login in other.members if login not in self.members)
+        self.outside_collaborators.extend(
+            login for login in other.outside_collaborators if login not in self.outside_collaborators
+        )
+
+    @property
+    def declared_members(self) -> typing.Set[str]:
+        logins = set(self.admins or []) | set(self.members)
+        for team in self.teams:
+            logins.update(team.team_maintainers + team.team_members)
+        return logins
+
+    def fetch_members(self) -> typing.Dict[str, str]:
+        """
+        Lowercase logins of organization members with their roles, ``'admin'`` or ``'member'``
+        """
+        members = {}
+        cursor = None
+        while True:
+            op = Operation(schema.Query)
+            connection = op.organization(login=self.organization_login).members_with_role(
+                first=self.page_size, after=cursor
+            )
+            connection.page_info.__fields__('has_next_page', 'end_cursor')
+            connection.edges.role()
+            connection.edges.node.login()
+            connection = (op + GitHubGraphQL().call(op)).organization.members_with_role
+
+            for edge in connection.edges:
+                members[edge.node.login.lower()] = str(edge.role).lower()
+
+            if not connection.page_info.has_next_page:
+                break
+            cursor = connection.page_info.end_cursor
+        return members
+
+    def fetch_invitations(self) -> typing.Dict[str, int]:
+        """
+        Lowercase logins of invited users with invitation IDs, invitations by email are left out
+        """
+        # PyGithub lists invitations as users, their IDs are IDs of invitations
+        return {user.login.lower(): user.id for user in fetch_all(self.organization.invitations()) if user.login}
+
+    def fetch_outside_collaborators(self) -> typing.List[str]:
+        return [user.login.lower() for user in fetch_all(self.organization.get_outside_collaborators())]
+
+    def run(self):
+        members = self.fetch_members()
+        invitations = self.fetch_invitations()
+        outside_collaborators = self.fetch_outside_collaborators()
+        declared = self.declared_members
+        organization = self.organization
+        user = self.github.get_lazy_user
+        changes = []
+
+        for login, role in sorted(members.items()):
+            if login not in declared:
+                if role == 'admin' and self.admins is None:
+                    continue
+                logger.warning(f'Found unlisted member {login} of organization {self.organization_login}, removing')
+                changes.append(self.plan(
+                    'remove_org_member', login, partial(organization.remove_from_membership, user(login))
+                ))
+            elif self.admins is not None and (role == 'admin') != (login in self.admins):
+                new_role = 'admin' if login in self.admins else 'member'
+                logger.warning(f'Role of {login} in organization {self.organization_login} should be {new_role}')
+                changes.append(self.plan(
+                    'set_org_role', login, partial(organization.add_to_members, user(login), new_role), role=new_role
+                ))
+
+        for login, invitation_id in sorted(invitations.items()):
+            if login not in declared:
+                logger.warning(f'Found invitation of unlisted user {login}, cancelling')
+                changes.append(self.plan('cancel_invitation', login, partial(self.cancel_invitation, invitation_id)))
+
+        # Members of teams are invited when they are added to teams
+        for login in sorted(set(self.admins or []) | set(self.members)):
+            if login in members or login in invitations or GitHubUserResolver().is_unknown(login):
+                continue
+            role = 'admin' if login in (self.admins or []) else 'member'
+            changes.append(self.plan(
+                'invite_org_member', login, partial(organization.add_to_members, user(login), role), role=role
+            ))
+
+        for login in outside_collaborators:
+            if login not in self.outside_collaborators:
+                logger.warning(f'Found unlisted outside collaborator {login}, removing')
+                changes.append(self.plan(
+                    'remove_outside_collaborator', login, partial(organization.remove_outside_collaborator, user(login))
+                ))
+
+        # Changes are applied one by one in the context of the object, so its writes keep a single token of the pool
+        # and the scheduler workers are not multiplied by a pool of their own
+        if settings.apply:
+            for change in changes:
+                change()
+        return self
+
+    def plan(self, action: str, login: str, change: typing.Callable, **details) -> typing.Callable:
+        """
+        Record the change of the user and return it back to be applied later
+        """
+        Plan().record(self.identity, action, login=login, **details)
+        return change
+
+    def cancel_invitation(self, invitation_id: int):
+        self.organization._requester.requestJsonAndCheck(
+            'DELETE', f'{self.organization.url}/invitations/{invitation_id}'
+        )
@@ -0,0 +1,50 @@
+import contextvars
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from github.PaginatedList import PaginatedList
+
+from github_team_organizer.classes.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Pool shared by all paginated lists, so lists fetched by parallel scheduler jobs do not multiply threads
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.jobs, thread_name_prefix='pagination')
+        return _executor
+
+
+def fetch_all(paginated_list: PaginatedList) -> list:
+    """
+    Fetch all items of a PyGithub list, pages after the first one are requested in parallel
+
+    A full first page means there are more, the number of pages is then taken from ``totalCount``.
+    """
+    items = paginated_list.get_page(0)
+    if len(items) < settings.per_page:
+        return items
+
+    last_page = math.ceil(paginated_list.totalCount / settings.per_page)
+    if last_page <= 1:
+        return items
+
+    logger.debug(f'Fetching pages 2-{last_page} of a paginated list in parallel')
+    executor = get_executor()
+    pages = [
+        executor.submit(contextvars.copy_context().run, paginated_list.get_page, page) for page in range(1, last_page)
+    ]
+    for page in pages:
+        items.extend(page.result())
+    return items
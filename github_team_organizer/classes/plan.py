@@ -0,0 +1,60 @@
+import dataclasses
+import json
+import threading
+import typing
+
+from github_team_organizer.classes.reporter import Reporter
+
+
+@dataclasses.dataclass
+class PlanItem:
+
+    organization: str
+    kind: str
+    name: str
+    action: str
+    details: dict = dataclasses.field(default_factory=dict)
+    before: typing.Optional[dict] = None
+    after: typing.Optional[dict] = None
+
+    @property
+    def sort_key(self):
+        return self.organization, self.kind, self.name, self.action, sorted(self.details.items())
+
+
+class Plan:
+    """
+    Changes found during reconciliation, applied or not depending on the mode
+    """
+
+    __instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if Plan.__instance is None:
+            Plan.__instance = super().__new__(cls)
+            Plan.__instance.items = []
+            Plan.__instance._keys = set()
+            Plan.__instance._lock = threading.Lock()
+        return Plan.__instance
+
+    def record(
+            self, identity: typing.Tuple[str, str, str], action: str,
+            before: dict = None, after: dict = None, **details
+    ):
+        organization, kind, name = identity
+        # Objects reconciled again after a failure record the same changes once more
+        key = (identity, action, json.dumps(details, sort_keys=True, default=str))
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            self.items.append(PlanItem(organization, kind, name, action, details, before, after))
+        Reporter().emit_change(identity, action, before=before, after=after, details=details)
+
+    def reset(self):
+        with self._lock:
+            self.items = []
+            self._keys = set()
+
+    def as_list(self) -> typing.List[dict]:
+        return [dataclasses.asdict(item) for item in sorted(self.items, key=lambda i: i.sort_key)]
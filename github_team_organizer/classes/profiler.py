@@ -0,0 +1,147 @@
+import contextlib
+import cProfile
+import dataclasses
+import json
+import os
+import pstats
+import threading
+import time
+import typing
+
+
+@dataclasses.dataclass
+class PhaseStats:
+
+    wall: float = 0.0
+    network: float = 0.0
+    requests: int = 0
+    entries: int = 0
+    profiles: typing.List[cProfile.Profile] = dataclasses.field(default_factory=list)
+
+    @property
+    def local(self) -> float:
+        return max(self.wall - self.network, 0.0)
+
+
+class Profiler:
+    """
+    Per-phase profiler of the run: deterministic profiles plus wall-clock vs network-wait time
+
+    Phases are tracked per thread (profilers of nested phases replace the outer one until they
+    finish), wall-clock time of a phase excludes its nested phases and is summed over all threads
+    it was active in.
+    """
+
+    __instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if Profiler.__instance is None:
+            Profiler.__instance = super().__new__(cls)
+            Profiler.__instance.enabled = False
+            Profiler.__instance.phases = {}
+            Profiler.__instance._local = threading.local()
+            Profiler.__instance._lock = threading.Lock()
+        return Profiler.__instance
+
+    @property
+    def stack(self) -> typing.List[list]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def current_phase(self) -> typing.Optional[str]:
+        return self.stack[-1][0] if self.stack else None
+
+    def get_phase(self, name: str) -> PhaseStats:
+        with self._lock:
+            return self.phases.setdefault(name, PhaseStats())
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        stack = self.stack
+        if stack and stack[-1][1] is not None:
+            stack[-1][1].disable()
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active, only time is measured then
+            profile = None
+
+        # Phase name, its profiler and time spent in nested phases
+        stack.append([name, profile, 0.0])
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            _, _, nested = stack.pop()
+            if profile is not None:
+                profile.disable()
+            if stack:
+                stack[-1][2] += duration
+                if stack[-1][1] is not None:
+                    stack[-1][1].enable()
+
+            stats = self.get_phase(name)
+            with self._lock:
+                stats.wall += duration - nested
+                stats.entries += 1
+                if profile is not None:
+                    stats.profiles.append(profile)
+
+    @contextlib.contextmanager
+    def network(self):
+        """
+        Measure time spent waiting for an API response in the current phase
+        """
+        if not self.enabled:
+            yield
+            return
+
+        name = self.current_phase or 'other'
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            stats = self.get_phase(name)
+            with self._lock:
+                stats.network += duration
+                stats.requests += 1
+
+    def summary(self) -> typing.Dict[str, dict]:
+        return {
+            name: {
+                'wall': round(stats.wall, 3),
+                'network': round(stats.network, 3),
+                'local': round(stats.local, 3),
+                'requests': stats.requests,
+                'entries': stats.entries,
+            }
+            for name, stats in sorted(self.phases.items())
+        }
+
+    def write(self, directory: str) -> typing.Dict[str, dict]:
+        """
+        Write ``<phase>.prof`` files (readable with ``pstats`` or snakeviz) and ``summary.json``
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, stats in self.phases.items():
+            if not stats.profiles:
+                continue
+            merged = pstats.Stats(stats.profiles[0])
+            for profile in stats.profiles[1:]:
+                merged.add(profile)
+            merged.dump_stats(os.path.join(directory, f'{name}.prof'))
+
+        summary = self.summary()
+        with open(os.path.join(directory, 'summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
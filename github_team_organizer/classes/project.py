@@ -7,10 +7,27 @@ from github.NamedUser import NamedUser
 from github_team_organizer.classes.base import BaseClass
 from github_team_organizer.classes.github import GitHubWrapper
 from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.scheduler import Scheduler, current_scheduler
 from github_team_organizer.classes.team import GitHubTeam
 
 
+# Repository defaults which subprojects extend instead of overriding
+LIST_DEFAULTS = ('admin_teams', 'master_teams', 'push_teams', 'pull_teams', 'triage_teams', 'precreated_branches')
+
+
+def extend(current: list, inherited: list) -> list:
+    return current + [x for x in inherited if x not in current]
+
+
 class GitHubProject(BaseClass):
+    """
+    Repositories and teams of a project, subprojects inherit repository defaults and teams of their parents
+
+    Inherited team lists are extended, other repository defaults are taken from the parent unless the
+    subproject sets them. Defaults are applied to repositories declared by name.
+    """
+
+    kind = 'project'
 
     def __init__(
             self,
@@ -32,25 +49,24 @@ class GitHubProject(BaseClass):
             qa_team_members: typing.List[typing.Union[str, 'NamedUser']] = None,
 
             github: PyGithub = None,
-            organization: PyGithubOrganization = None
+            organization: typing.Union[str, PyGithubOrganization] = None
     ):
         super().__init__()
 
         self.github = github or GitHubWrapper()
-        self.organization = organization or self.github.default_organization
+        self.set_organization(organization)
 
         self.name = name
 
+        self.parent_project = None
         self.subprojects = []
-        if subprojects:
-            for subproject in subprojects:
-                self.subprojects.append(subproject)
 
         self.master_teams = master_teams or []
         if master_team_members:
             self.master_teams.append(
                 GitHubTeam(
                     name=f'projects/{self.name}/masters',
+                    organization=self.organization_login,
                     description=f'{self.name} / Masters',
                     team_members=master_team_members,
                 )
@@ -61,6 +77,7 @@ class GitHubProject(BaseClass):
             self.dev_teams.append(
                 GitHubTeam(
                     name=f'project/{self.name}/developers',
+                    organization=self.organization_login,
                     description=f'{self.name} / Developers',
                     team_members=dev_team_members,
                 )
@@ -71,13 +88,21 @@ class GitHubProject(BaseClass):
             self.qa_teams.append(
                 GitHubTeam(
                     name=f'project/{self.name}/qa',
+                    organization=self.organization_login,
                     description=f'{self.name} / QA',
                     team_members=qa_team_members,
                 )
             )
 
-        self.repository_defaults = repository_defaults or {}
-        self.repositories = [self.init_repository(r) for r in repositories]
+        self.own_repository_defaults = repository_defaults or {}
+        self.repository_defaults = dict(self.own_repository_defaults)
+        self.named_repositories = []
+        self.repositories = [self.init_repository(r) for r in repositories or []]
+
+        for subproject in subprojects or []:
+            self.add_subproject(subproject)
+        if parent_project is not None:
+            parent_project.add_subproject(self)
 
         # for r in self.repositories:
         #     r.verify_teams(self.master_teams, 'push')
@@ -86,6 +111,10 @@ class GitHubProject(BaseClass):
     def __str__(self):
         return f'Project: {self.name}'
 
+    @property
+    def dependencies(self) -> typing.List[typing.Union[GitHubTeam, GitHubRepositoryWrapper, 'GitHubProject']]:
+        return self.master_teams + self.dev_teams + self.qa_teams + self.repositories + self.subprojects
+
     def init_repository(self, repository) -> GitHubRepositoryWrapper:
         if isinstance(repository, str):
             # full_name = '/'.join(filter(None, [
@@ -93,14 +122,67 @@ class GitHubProject(BaseClass):
             #     repository
             # ]))
 
-            return GitHubRepositoryWrapper(
+            repository = GitHubRepositoryWrapper(
                 name=repository,
-                organization=self.organization,
+                organization=self.organization_login,
                 **self.repository_defaults
             )
+            self.named_repositories.append(repository)
+            return repository
         else:
             return repository
 
+    def add_subproject(self, subproject: 'GitHubProject'):
+        if subproject.parent_project not in (None, self):
+            raise ValueError(f'{subproject} is already a subproject of {subproject.parent_project.name}')
+        subproject.parent_project = self
+        if subproject not in self.subprojects:
+            self.subprojects.append(subproject)
+        subproject.inherit(self)
+
+    def inherit(self, parent: 'GitHubProject'):
+        """
+        Take repository defaults and teams of the parent project, subprojects inherit them in turn
+        """
+        defaults = {k: v for k, v in parent.repository_defaults.items() if k not in LIST_DEFAULTS}
+        defaults.update({k: v for k, v in self.own_repository_defaults.items() if k not in LIST_DEFAULTS})
+        for field in LIST_DEFAULTS:
+            if field in parent.repository_defaults or field in self.own_repository_defaults:
+                defaults[field] = extend(
+                    list(self.own_repository_defaults.get(field) or []), parent.repository_defaults.get(field) or []
+                )
+        self.repository_defaults = defaults
+
+        # Lists are replaced, not extended in place, as they may be shared with other declarations
+        for repository in self.named_repositories:
+            for field, value in defaults.items():
+                if field in LIST_DEFAULTS:
+                    setattr(repository, field, extend(getattr(repository, field), value))
+                else:
+                    repository.set_project_default(field, value, self)
+
+        for field in ('master_teams', 'dev_teams', 'qa_teams'):
+            setattr(self, field, extend(getattr(self, field), getattr(parent, field)))
+
+        for subproject in self.subprojects:
+            subproject.inherit(self)
+
     def run(self):
-        for r in self.repositories:
-            r.run()
+        """
+        Reconcile repositories and subprojects (recursively) which are not reconciled yet, independent
+        ones in parallel, e.g. when the project is reconciled on its own and not by the organizer
+
+        Under a scheduler they are its dependencies already and are reconciled before the project
+        (objects of other shards are left out), so no other scheduler is started.
+        """
+        if current_scheduler.get() is not None:
+            return self
+
+        scheduler = Scheduler()
+        for dependency in self.dependencies:
+            if not dependency.is_reconciled:
+                scheduler.add(dependency)
+        scheduler.run()
+        if scheduler.failures:
+            raise RuntimeError(f'Failed to reconcile {len(scheduler.failures)} objects of {self}')
+        return self
@@ -0,0 +1,98 @@
+import threading
+import typing
+import weakref
+from collections.abc import Mapping
+
+
+def freeze(key: str, value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        # Actor IDs are de-duplicated, other lists (e.g. status check contexts) keep their order
+        return frozenset(value) if key.endswith('_actor_ids') else tuple(dict.fromkeys(value))
+    return value
+
+
+class ProtectionTemplate(Mapping):
+    """
+    Immutable settings of a branch protection rule, shared by every repository with the same settings
+
+    Templates are interned: equal settings give the same object, so rules merged with defaults are not
+    copied per repository. Changes are made with ``merge``, which returns another template. Interned
+    templates are held weakly, templates no repository uses anymore (e.g. after a watch cycle) are dropped.
+    """
+
+    __slots__ = ('_settings', '_hash', '__weakref__')
+
+    _templates: typing.MutableMapping[frozenset, 'ProtectionTemplate'] = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, settings: typing.Mapping = None):
+        self._settings = {key: freeze(key, value) for key, value in (settings or {}).items()}
+        self._hash = hash(frozenset(self._settings.items()))
+
+    @classmethod
+    def intern(cls, settings: typing.Mapping = None) -> 'ProtectionTemplate':
+        if isinstance(settings, ProtectionTemplate):
+            return settings
+        template = cls(settings)
+        with cls._lock:
+            return cls._templates.setdefault(frozenset(template._settings.items()), template)
+
+    def merge(self, settings: typing.Mapping = None, **values) -> 'ProtectionTemplate':
+        return self.intern({**self._settings, **(settings or {}), **values})
+
+    def extend(self, key: str, values: typing.Iterable) -> 'ProtectionTemplate':
+        """
+        Template with the values added to the list setting, values which are already there are not repeated
+        """
+        return self.merge({key: (*self.get(key, ()), *values)})
+
+    def to_input(self, **values) -> dict:
+        """
+        Mutation input, actor IDs are sorted so the same settings give the same payload
+        """
+        return {
+            key: sorted(value) if isinstance(value, frozenset) else list(value) if isinstance(value, tuple) else value
+            for key, value in {**self._settings, **values}.items()
+        }
+
+    def __getitem__(self, key: str):
+        return self._settings[key]
+
+    def __iter__(self):
+        return iter(self._settings)
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ProtectionTemplate):
+            return self is other or (self._hash == other._hash and self._settings == other._settings)
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self._settings!r})'
+
+
+DEFAULT_PROTECTION = ProtectionTemplate.intern({
+    'requires_approving_reviews': True,
+    'required_approving_review_count': 1,
+
+    'requires_commit_signatures': False,
+
+    'is_admin_enforced': False,
+    'dismisses_stale_reviews': True,
+    'requires_code_owner_reviews': False,
+
+    'requires_status_checks': True,
+    'requires_strict_status_checks': False,
+    'required_status_check_contexts': [],
+
+    'restricts_review_dismissals': False,
+    'review_dismissal_actor_ids': [],
+
+    'restricts_pushes': True,
+    'push_actor_ids': [],
+})
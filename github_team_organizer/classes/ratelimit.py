@@ -0,0 +1,98 @@
+import contextvars
+import dataclasses
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class CallCounter:
+
+    count: int = 0
+
+
+# Counter of API requests made in the current context, e.g. during reconciliation of a single object
+api_calls = contextvars.ContextVar('api_calls', default=None)
+
+
+@dataclasses.dataclass
+class RateLimitBudget:
+
+    remaining: int = -1
+    limit: int = -1
+    reset_time: float = 0
+    lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+class RateLimiter:
+    """
+    Rate limit budgets shared by all API clients of the process
+
+    Budgets are updated from ``X-RateLimit-*`` response headers, a request is delayed until the reset
+    time when the remaining budget of its resource (``core`` for REST, ``graphql``) drops to the reserve.
+    Every token of the token pool has its own budgets. Every budget has its own lock and requests wait
+    without holding it, so an exhausted budget delays only requests spending it.
+    """
+
+    __instance = None
+
+    reserve = 10
+
+    def __new__(cls, *args, **kwargs):
+        if RateLimiter.__instance is None:
+            RateLimiter.__instance = super().__new__(cls)
+        return RateLimiter.__instance
+
+    def __init__(self):
+        if not hasattr(self, 'budgets'):
+            self.budgets = {}
+            self.total_calls = 0
+            self._lock = threading.Lock()
+
+    def get_budget(self, resource: str, token: str = None) -> RateLimitBudget:
+        budget = self.budgets.get((resource, token))
+        if budget is None:
+            with self._lock:
+                budget = self.budgets.setdefault((resource, token), RateLimitBudget())
+        return budget
+
+    def is_exhausted(self, resource: str, token: str = None) -> bool:
+        budget = self.get_budget(resource, token)
+        return 0 <= budget.remaining <= self.reserve and budget.reset_time > time.time()
+
+    def acquire(self, resource: str, token: str = None):
+        counter = api_calls.get()
+        if counter is not None:
+            counter.count += 1
+
+        with self._lock:
+            self.total_calls += 1
+
+        budget = self.get_budget(resource, token)
+        delay = 0
+        with budget.lock:
+            if 0 <= budget.remaining <= self.reserve:
+                delay = budget.reset_time - time.time()
+                if delay <= 0:
+                    # The budget is reset, it's unknown until the next response
+                    budget.remaining = -1
+            elif budget.remaining > 0:
+                budget.remaining -= 1
+
+        if delay > 0:
+            logger.warning(f'Rate limit for {resource} is almost exhausted, waiting {delay:.0f}s for reset')
+            time.sleep(delay)
+
+    def update(self, resource: str, headers, token: str = None):
+        headers = {k.lower(): v for k, v in dict(headers).items()}
+        if 'x-ratelimit-remaining' not in headers:
+            return
+
+        budget = self.get_budget(headers.get('x-ratelimit-resource', resource), token)
+        with budget.lock:
+            budget.remaining = int(headers['x-ratelimit-remaining'])
+            budget.limit = int(headers.get('x-ratelimit-limit', budget.limit))
+            budget.reset_time = float(headers.get('x-ratelimit-reset', budget.reset_time))
@@ -0,0 +1,127 @@
+import json
+import typing
+
+from github_team_organizer.classes.collaborators import GitHubCollaboratorScanner
+from github_team_organizer.classes.hierarchy import TeamTree, strongest_permission
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.classes.team import GitHubTeam
+
+
+def get_inherited_permissions(organization: str) -> typing.Dict[str, typing.Dict[str, str]]:
+    """
+    Repository permissions declared teams get from their ancestors on top of direct ones
+    """
+    parents = {t.name: t.parent_name for t in GitHubTeam.instances() if t.organization_login == organization}
+    if not any(parents.values()):
+        return {}
+
+    direct = {}
+    for r in GitHubRepositoryWrapper.instances():
+        if r.organization_login != organization:
+            continue
+        for permission, teams in (
+                ('admin', r.admin_teams), ('push', r.master_teams + r.push_teams),
+                ('pull', r.pull_teams), ('triage', r.triage_teams),
+        ):
+            for team in teams:
+                granted = direct.setdefault(team.name, {})
+                granted[r.name] = strongest_permission(granted.get(r.name, permission), permission)
+
+    inherited = {}
+    for slug, permissions in TeamTree(parents).get_effective_permissions(direct).items():
+        permissions = {
+            name: permission for name, permission in sorted(permissions.items())
+            if direct.get(slug, {}).get(name) != permission
+        }
+        if permissions:
+            inherited[slug] = permissions
+    return inherited
+
+
+def build_report(
+        unmanaged_repositories: typing.Dict[str, typing.Iterable[str]],
+        failures: typing.Dict[typing.Tuple[str, str, str], str] = None
+) -> dict:
+    return {
+        'shards': [{'index': settings.shard_index, 'count': settings.shard_count}],
+        'organizations': sorted(settings.org),
+        'plan': Plan().as_list(),
+        'collaborators': {
+            organization: {
+                name: logins for name, logins in sorted(GitHubCollaboratorScanner(organization).report.items()) if logins
+            }
+            for organization in sorted(settings.org)
+        },
+        'unmanaged_repositories': {
+            organization: sorted(names) for organization, names in sorted(unmanaged_repositories.items())
+        },
+        'inherited_permissions': {
+            organization: get_inherited_permissions(organization) for organization in sorted(settings.org)
+        },
+        'failures': [
+            {'organization': organization, 'kind': kind, 'name': name, 'error': error}
+            for (organization, kind, name), error in sorted((failures or {}).items())
+        ],
+    }
+
+
+def write_report(path: str, report: dict):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def read_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def merge_reports(reports: typing.List[dict]) -> dict:
+    """
+    Combine reports of several shards into a single one
+    """
+    merged = {
+        'shards': [],
+        'organizations': set(),
+        'plan': [],
+        'collaborators': {},
+        'unmanaged_repositories': {},
+        'inherited_permissions': {},
+        'failures': [],
+    }
+
+    for report in reports:
+        merged['shards'] += report['shards']
+        merged['organizations'].update(report['organizations'])
+        merged['plan'] += report['plan']
+        merged['failures'] += report.get('failures', [])
+        for organization, repositories in report['collaborators'].items():
+            merged['collaborators'].setdefault(organization, {}).update(repositories)
+        for organization, teams in report.get('inherited_permissions', {}).items():
+            merged['inherited_permissions'].setdefault(organization, {}).update(teams)
+        for organization, names in report['unmanaged_repositories'].items():
+            merged['unmanaged_repositories'].setdefault(organization, set()).update(names)
+
+    # A change of an object may be planned by several shards, e.g. when a team is referenced from both
+    unique = {}
+    for item in merged['plan']:
+        details = json.dumps(item['details'], sort_keys=True)
+        key = (item['organization'], item['kind'], item['name'], item['action'], details)
+        unique.setdefault(key, item)
+    merged['plan'] = list(unique.values())
+
+    merged['shards'].sort(key=lambda s: (s['count'], s['index']))
+    merged['organizations'] = sorted(merged['organizations'])
+    merged['plan'].sort(key=lambda i: (i['organization'], i['kind'], i['name'], i['action'], sorted(i['details'].items())))
+    merged['failures'].sort(key=lambda f: (f['organization'], f['kind'], f['name']))
+    merged['unmanaged_repositories'] = {o: sorted(n) for o, n in sorted(merged['unmanaged_repositories'].items())}
+    return merged
+
+
+def get_missing_shards(report: dict) -> typing.List[int]:
+    counts = {s['count'] for s in report['shards']}
+    if len(counts) != 1:
+        raise ValueError(f'Reports of different shard counts can not be merged: {sorted(counts)}')
+    count = counts.pop()
+    return sorted(set(range(count)) - {s['index'] for s in report['shards']})
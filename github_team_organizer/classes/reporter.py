@@ -0,0 +1,81 @@
+import io
+import json
+import sys
+import threading
+import time
+import typing
+
+import click
+
+
+class Reporter:
+    """
+    Output of the run: human-readable progress lines and a stream of machine-readable JSONL events
+
+    Events are written through a large buffer and flushed on close, human output goes to stderr
+    when events are streamed to stdout.
+    """
+
+    __instance = None
+
+    buffer_size = 1024 * 1024
+
+    def __new__(cls, *args, **kwargs):
+        if Reporter.__instance is None:
+            Reporter.__instance = super().__new__(cls)
+            Reporter.__instance.human = True
+            Reporter.__instance.events = None
+            Reporter.__instance.events_to_stdout = False
+            Reporter.__instance._lock = threading.Lock()
+        return Reporter.__instance
+
+    def open(self, events_path: str = None, human: bool = True):
+        self.human = human
+        if events_path == '-':
+            self.events = io.TextIOWrapper(
+                io.BufferedWriter(io.FileIO(sys.stdout.fileno(), 'w', closefd=False), self.buffer_size),
+                encoding='utf-8',
+            )
+        elif events_path:
+            self.events = open(events_path, 'w', encoding='utf-8', buffering=self.buffer_size)
+        self.events_to_stdout = events_path == '-'
+        return self
+
+    def close(self):
+        with self._lock:
+            if self.events is not None:
+                self.events.flush()
+                if not self.events_to_stdout:
+                    self.events.close()
+                self.events = None
+
+    def secho(self, message: str, **styles):
+        if self.human:
+            click.secho(message, err=self.events_to_stdout, **styles)
+
+    def emit(self, event: str, **fields):
+        if self.events is None:
+            return
+
+        line = json.dumps({'event': event, 'time': round(time.time(), 3), **fields}, separators=(',', ':'), default=str)
+        with self._lock:
+            if self.events is not None:
+                self.events.write(line)
+                self.events.write('\n')
+
+    def emit_change(
+            self, identity: typing.Tuple[str, str, str], action: str,
+            before: dict = None, after: dict = None, details: dict = None
+    ):
+        self.emit('change', object='/'.join(identity), action=action, before=before, after=after, details=details or {})
+
+    def emit_reconciled(
+            self, identity: typing.Tuple[str, str, str], duration: float, api_calls: int, error: Exception = None
+    ):
+        self.emit(
+            'reconciled', object='/'.join(identity), duration=round(duration, 3), api_calls=api_calls,
+            error=str(error) if error else None,
+        )
+
+    def emit_failed(self, identity: typing.Tuple[str, str, str], error: str):
+        self.emit('failed', object='/'.join(identity), error=error)
@@ -1,10 +1,8 @@
 import logging
 import os
 import typing
-from collections import defaultdict
 from fnmatch import fnmatch
 
-import click
 from cached_property import cached_property
 from github import Github as PyGithub, GithubObject
 from github.GithubException import GithubException, UnknownObjectException
@@ -13,12 +11,20 @@ from github.Repository import Repository as PyGithubRepository
 from github.Team import Team as PyGithubTeam
 from sgqlc.operation import Operation
 
-from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.base import BaseClass, DuplicateDeclarationError
+from github_team_organizer.classes.collaborators import GitHubCollaboratorScanner
+from github_team_organizer.classes.discovery import GitHubRepositoryDiscovery
 from github_team_organizer.classes.github import GitHubWrapper
 from github_team_organizer.graphql.github_schema import github_schema as schema
 from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.pagination import fetch_all
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.profiler import Profiler
+from github_team_organizer.classes.protection import DEFAULT_PROTECTION, ProtectionTemplate
+from github_team_organizer.classes.reporter import Reporter
 from github_team_organizer.classes.settings import settings
 from github_team_organizer.classes.team import GitHubTeam
+from github_team_organizer.classes.tracing import Tracer
 
 
 logger = logging.getLogger(__name__)
@@ -26,6 +32,10 @@ logger = logging.getLogger(__name__)
 
 class GitHubRepositoryWrapper(BaseClass):
 
+    kind = 'repository'
+
+    remote_attributes = ('obj', 'gq_repository', 'gq_branch_protection_rules')
+
     cicd_enabled = True
     cicd_master_branch = 'master'
     cicd_develop_branch = 'develop'
@@ -52,13 +62,18 @@ class GitHubRepositoryWrapper(BaseClass):
             auto_cicd_protection_mode: str = None,
 
             github: PyGithub = None,
-            organization: PyGithubOrganization = None
+            organization: typing.Union[str, PyGithubOrganization] = None
     ):
         super().__init__()
-        self._protection = defaultdict(dict)
+        self._protection: typing.Dict[str, ProtectionTemplate] = {}
+        # Rules merged with defaults by actor IDs of the defaults, see get_protection
+        self._merged_protection: typing.Dict[typing.Tuple[str, ...], typing.Dict[str, ProtectionTemplate]] = {}
+        self._actual_teams = None
+        # Repository defaults of projects which declare the repository by name, by identities of the projects
+        self._project_defaults: typing.Dict[str, typing.Dict[tuple, typing.Any]] = {}
 
         self.github = github or GitHubWrapper()
-        self.organization = organization if organization else GitHubWrapper().default_organization
+        self.set_organization(organization)
 
         self.admin_teams = admin_teams or []
         self.master_teams = master_teams or []
@@ -79,7 +94,7 @@ class GitHubRepositoryWrapper(BaseClass):
 
     @cached_property
     def full_name(self) -> str:
-        return f'{self.organization.login}/{self.name}'
+        return f'{self.organization_login}/{self.name}'
 
     @cached_property
     def obj(self) -> PyGithubRepository:
@@ -88,7 +103,7 @@ class GitHubRepositoryWrapper(BaseClass):
     @cached_property
     def gq_repository(self) -> schema.Repository:
         op = Operation(schema.Query)
-        r = op.repository(owner=self.organization.login, name=self.name)
+        r = op.repository(owner=self.organization_login, name=self.name)
         r.id()
         r.branch_protection_rules(first=100)
         r.branch_protection_rules.nodes.id()
@@ -109,37 +124,86 @@ class GitHubRepositoryWrapper(BaseClass):
             if rule.pattern == pattern:
                 return rule.id
 
-    def get_default_protection(self):
-        return {
-            'requires_approving_reviews': True,
-            'required_approving_review_count': 1,
-
-            'requires_commit_signatures': False,
-
-            'is_admin_enforced': False,
-            'dismisses_stale_reviews': True,
-            'requires_code_owner_reviews': False,
-
-            'requires_status_checks': True,
-            'requires_strict_status_checks': False,
-            'required_status_check_contexts': [],
-
-            'restricts_review_dismissals': False,
-            'review_dismissal_actor_ids': [t.gq_node_id for t in self.master_teams],
-
-            'restricts_pushes': True,
-            'push_actor_ids': [t.gq_node_id for t in self.master_teams],
-        }
+    def get_default_protection(self, actor_ids: typing.List[str] = None) -> ProtectionTemplate:
+        if actor_ids is None:
+            actor_ids = [t.gq_node_id for t in self.master_teams]
+        return DEFAULT_PROTECTION.merge(review_dismissal_actor_ids=actor_ids, push_actor_ids=actor_ids)
 
     @property
     def protection(self):
-        return self._protection
+        """
+        Protection rules merged with defaults, team node IDs are resolved on the first access
+        """
+        return self.get_protection()
+
+    def get_protection(self, actor_ids: typing.List[str] = None) -> typing.Dict[str, ProtectionTemplate]:
+        if actor_ids is None:
+            actor_ids = [t.gq_node_id for t in self.master_teams]
+        key = tuple(actor_ids)
+        if key not in self._merged_protection:
+            default = self.get_default_protection(actor_ids)
+            self._merged_protection[key] = {k: default.merge(v) for k, v in self._protection.items()}
+        return self._merged_protection[key]
 
     @protection.setter
     def protection(self, value: dict):
-        self._protection = {k: {**self.get_default_protection(), **v} for k, v in value.items()}
+        # Rules are interned, so repositories sharing a config (e.g. project defaults) share the templates
+        self._protection = {k: ProtectionTemplate.intern(v) for k, v in value.items()}
+        self._merged_protection = {}
+
+    def refresh(self):
+        super().refresh()
+        self.refresh_teams()
+        self._merged_protection = {}
+
+    def refresh_teams(self):
+        """
+        Forget teams of the repository only, settings and protection rules are kept
+        """
+        self._actual_teams = None
+
+    @property
+    def dependencies(self) -> typing.List[GitHubTeam]:
+        teams = []
+        for team in self.admin_teams + self.master_teams + self.push_teams + self.pull_teams + self.triage_teams:
+            if team not in teams:
+                teams.append(team)
+        return teams
+
+    def merge(self, other: 'GitHubRepositoryWrapper'):
+        settings_fields = ('default_branch_name', 'master_branch_name', 'auto_cicd_protection_mode')
+        if any(getattr(other, f) != getattr(self, f) for f in settings_fields):
+            raise DuplicateDeclarationError(f'Repository {self.full_name} is declared twice with different settings')
+        if other._protection and self._protection and other._protection != self._protection:
+            raise DuplicateDeclarationError(f'Repository {self.full_name} is declared twice with different protection')
+
+        for attr in ('admin_teams', 'master_teams', 'push_teams', 'pull_teams', 'triage_teams', 'precreated_branches'):
+            current = getattr(self, attr)
+            current.extend(x for x in getattr(other, attr) if x not in current)
+
+        if not self._protection:
+            self._protection = other._protection
+            self._merged_protection = {}
+
+    def set_project_default(self, field: str, value, project: BaseClass):
+        """
+        Apply a repository default of a project, projects sharing the repository (e.g. subprojects of
+        different parents) may not set it to different values, like declarations in ``merge``
+        """
+        defaults = self._project_defaults.setdefault(field, {})
+        defaults[project.identity] = value
+        if any(v != value for v in defaults.values()):
+            projects = ', '.join(identity[2] for identity in defaults)
+            raise DuplicateDeclarationError(
+                f'Repository {self.full_name} gets different {field} from projects: {projects}'
+            )
+        setattr(self, field, value)
 
     def run(self):
+        if GitHubRepositoryDiscovery(self.organization_login).is_skipped_name(self.name):
+            logger.info(f'Repository {self.full_name} is archived or a fork, skipping')
+            return self
+
         self.update_settings()
         self.clean_direct_collaborators()
 
@@ -149,15 +213,17 @@ class GitHubRepositoryWrapper(BaseClass):
         self.sync_teams(self.triage_teams, 'triage')
 
         if settings.apply:
-            current_protected_branches = {rule.pattern: rule.id for rule in self.gq_branch_protection_rules}
+            with Tracer().span('protection', 'phase'), Profiler().phase('protection'):
+                current_protected_branches = {rule.pattern: rule.id for rule in self.gq_branch_protection_rules}
 
-            for protection_pattern in self.protection.keys():
-                self.apply_protection(protection_pattern)
-                current_protected_branches.pop(protection_pattern, None)
+                for protection_pattern in self.protection.keys():
+                    self.apply_protection(protection_pattern)
+                    current_protected_branches.pop(protection_pattern, None)
 
-            for rule_pattern, rule_id in current_protected_branches.items():
-                click.secho(f'Removing old protection rule: {rule_pattern} / {rule_id}', bg='yellow')
-                self.remove_protection(rule_id)
+                for rule_pattern, rule_id in current_protected_branches.items():
+                    Reporter().secho(f'Removing old protection rule: {rule_pattern} / {rule_id}', bg='yellow')
+                    Plan().record(self.identity, 'remove_protection', pattern=rule_pattern)
+                    self.remove_protection(rule_id)
 
         return self
 
@@ -178,44 +244,66 @@ class GitHubRepositoryWrapper(BaseClass):
         return self
 
     def clean_direct_collaborators(self):
-        collaborators = self.obj.get_collaborators(affiliation='direct')
-        if collaborators.totalCount:
+        scanner = GitHubCollaboratorScanner(self.organization_login)
+        if scanner.is_scanned(self.name):
+            collaborators = scanner.get_collaborators(self.name)
+        else:
+            collaborators = [c.login for c in fetch_all(self.obj.get_collaborators(affiliation='direct'))]
+
+        if collaborators:
             logger.warning(f"Found direct collaborators in repository: {self}, cleaning")
             for collaborator in collaborators:
                 logger.warning(f" - {collaborator}")
+                Plan().record(self.identity, 'remove_collaborator', login=collaborator)
                 if settings.apply:
                     self.obj.remove_from_collaborators(collaborator)
 
+    def get_actual_teams(self, permission: str) -> typing.List[PyGithubTeam]:
+        """
+        Teams with the permission to the repository, teams are listed once until they are changed
+        """
+        if self._actual_teams is None:
+            self._actual_teams = fetch_all(self.obj.get_teams())
+        return [t for t in self._actual_teams if t.permission == permission]
+
     def sync_teams(self, teams: typing.List[GitHubTeam], permission: str):
         # Remove not listed teams
-        for actual_team in [t for t in self.obj.get_teams() if t.permission == permission]:  # type:PyGithubTeam
+        for actual_team in self.get_actual_teams(permission):  # type:PyGithubTeam
             if actual_team.slug not in [t.name for t in teams]:
                 logger.warning(f'Found wrong team {actual_team} with {permission} access to {self}, removing')
+                Plan().record(self.identity, 'remove_team', team=actual_team.slug, permission=permission)
 
                 # logger.warning(f'Teams: {teams}')
                 # logger.warning(f'A Team: {actual_team}')
 
                 if settings.apply:
                     actual_team.remove_from_repos(self.obj)
+                    self._actual_teams = None
         # Add required teams
-        actual_teams = [t for t in self.obj.get_teams() if t.permission == permission]
+        actual_teams = self.get_actual_teams(permission)
         for team in teams:
             if team.name not in [t.slug for t in actual_teams]:
                 logger.warning(f'Not found {team} with {permission} access to {self}, adding')
-                if settings.apply:
+                Plan().record(self.identity, 'add_team', team=team.name, permission=permission)
+                if settings.apply and team.obj is None:
+                    # A team of another shard is created by that shard
+                    logger.warning(f'Team {team.name} does not exist yet, skipping')
+                elif settings.apply:
                     # team.obj.add_to_repos(self.obj)
                     team.obj.set_repo_permission(self.obj, permission)
+                    self._actual_teams = None
 
     def apply_protection(self, protection_pattern: str):
-        protection = dict(self.protection.get(protection_pattern))
+        protection = self.protection[protection_pattern]
         if fnmatch(self.master_branch_name, protection_pattern):
-            protection['push_actor_ids'] += [t.gq_node_id for t in self.master_teams]
+            protection = protection.extend('push_actor_ids', [t.gq_node_id for t in self.master_teams])
 
         for branch_name in self.precreated_branches:
             try:
                 _ = self.obj.get_branch(branch_name)
             except GithubException:
                 logger.warning(f'Branch {branch_name} not found, will be created')
+                Plan().record(self.identity, 'create_branch', branch=branch_name)
                 if settings.apply:
                     master_branch = self.obj.get_branch('master')
                     self.obj.create_git_ref(
@@ -226,32 +314,29 @@ class GitHubRepositoryWrapper(BaseClass):
         if self.auto_cicd_protection_mode == 'jenkins':
             try:
                 if self.obj.get_contents('Jenkinsfile').size != 0:
-                    if protection.get('required_status_check_contexts') is None:
-                        protection['required_status_check_contexts'] = []
-                    protection['required_status_check_contexts'] += [
+                    protection = protection.extend('required_status_check_contexts', [
                         'continuous-integration/jenkins/branch',
                         'continuous-integration/jenkins/pr-merge',
-                    ]
+                    ])
                 else:
-                    click.secho(f'Jenkinsfile is empty for {self.obj}', bold=True, bg='yellow')
+                    Reporter().secho(f'Jenkinsfile is empty for {self.obj}', bold=True, bg='yellow')
             except UnknownObjectException:
-                click.secho(f'Jenkinsfile not found for {self.obj}', bold=True, bg='yellow')
-
-        protection['pattern'] = protection_pattern
+                Reporter().secho(f'Jenkinsfile not found for {self.obj}', bold=True, bg='yellow')
 
         op = Operation(schema.Mutation)
 
         if self.gq_get_branch_protection_rule_id(protection_pattern):
-            protection['branch_protection_rule_id'] = self.gq_get_branch_protection_rule_id(protection_pattern)
-            op.update_branch_protection_rule(input=schema.UpdateBranchProtectionRuleInput(
-                **protection
-            ))
+            op.update_branch_protection_rule(input=schema.UpdateBranchProtectionRuleInput(**protection.to_input(
+                pattern=protection_pattern,
+                branch_protection_rule_id=self.gq_get_branch_protection_rule_id(protection_pattern),
+            )))
         else:
-            protection['repository_id'] = self.gq_node_id
-            op.create_branch_protection_rule(input=schema.CreateBranchProtectionRuleInput(
-                **protection
-            ))
+            op.create_branch_protection_rule(input=schema.CreateBranchProtectionRuleInput(**protection.to_input(
+                pattern=protection_pattern,
+                repository_id=self.gq_node_id,
+            )))
 
+        Plan().record(self.identity, 'apply_protection', pattern=protection_pattern)
         if settings.apply:
             GitHubGraphQL().call(op)
 
@@ -0,0 +1,117 @@
+import logging
+import threading
+import typing
+
+from sgqlc.operation import Operation
+
+from github_team_organizer.classes.cache import UserCache
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.graphql.github_schema import github_schema as schema
+
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubUserResolver:
+    """
+    Resolves user logins to node IDs, many logins per GraphQL query (one aliased ``user`` field per login)
+
+    Unknown logins are resolved to ``None``. Resolved logins are kept in the on-disk cache,
+    so warm runs request only new or expired ones.
+    """
+
+    __instance = None
+
+    batch_size = 50
+
+    def __new__(cls, *args, **kwargs):
+        if GitHubUserResolver.__instance is None:
+            GitHubUserResolver.__instance = super().__new__(cls)
+            GitHubUserResolver.__instance.users = {}
+            GitHubUserResolver.__instance.cache = UserCache()
+            GitHubUserResolver.__instance._lock = threading.Lock()
+        return GitHubUserResolver.__instance
+
+    def resolve(self, logins: typing.Iterable[str]) -> typing.Dict[str, typing.Optional[dict]]:
+        logins = {login.lower() for login in logins}
+        with self._lock:
+            pending = sorted(logins - self.users.keys())
+
+        if pending and settings.cache:
+            cached = self.cache.get_many(pending)
+            logger.info(f'{len(cached)} of {len(pending)} users are found in cache')
+            with self._lock:
+                self.users.update(cached)
+            pending = [login for login in pending if login not in cached]
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            op = Operation(schema.Query)
+            for i, login in enumerate(batch):
+                op.user(login=login, __alias__=f'u{i}').__fields__('id', 'database_id', 'login')
+            data = GitHubGraphQL().call(op, allow_partial=True)
+
+            with self._lock:
+                for i, login in enumerate(batch):
+                    user = (data.get('data') or {}).get(f'u{i}')
+                    self.users[login] = {'id': user['id'], 'database_id': user['databaseId']} if user else None
+                    if not user:
+                        logger.warning(f'User {login} not found')
+
+            if settings.cache:
+                self.cache.set_many({login: self.users[login] for login in batch})
+
+        return {login: self.users.get(login) for login in logins}
+
+    def is_unknown(self, login: str) -> bool:
+        login = login.lower()
+        return login in self.users and self.users[login] is None
+
+
+class GitHubTeamResolver:
+    """
+    Resolves team slugs of an organization to node IDs, many teams per GraphQL query
+    """
+
+    __instances = {}
+
+    batch_size = 50
+
+    def __new__(cls, organization_login: str):
+        if organization_login not in GitHubTeamResolver.__instances:
+            instance = super().__new__(cls)
+            instance.organization_login = organization_login
+            instance.teams = {}
+            instance._lock = threading.Lock()
+            GitHubTeamResolver.__instances[organization_login] = instance
+        return GitHubTeamResolver.__instances[organization_login]
+
+    def resolve(self, slugs: typing.Iterable[str]) -> typing.Dict[str, typing.Optional[str]]:
+        slugs = set(slugs)
+        with self._lock:
+            pending = sorted(slugs - {slug for slug, node_id in self.teams.items() if node_id})
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            op = Operation(schema.Query)
+            o = op.organization(login=self.organization_login)
+            for i, slug in enumerate(batch):
+                o.team(slug=slug, __alias__=f't{i}').id()
+            data = GitHubGraphQL().call(op, allow_partial=True)
+
+            organization = (data.get('data') or {}).get('organization') or {}
+            with self._lock:
+                for i, slug in enumerate(batch):
+                    team = organization.get(f't{i}')
+                    self.teams[slug] = team['id'] if team else None
+
+        return {slug: self.teams.get(slug) for slug in slugs}
+
+    def get_node_id(self, slug: str) -> typing.Optional[str]:
+        """
+        Node ID of the team, teams missing from the cache (e.g. created during the run) are requested again
+        """
+        if not self.teams.get(slug):
+            self.resolve([slug])
+        return self.teams.get(slug)
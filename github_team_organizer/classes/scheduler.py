@@ -0,0 +1,134 @@
+import contextvars
+import logging
+import typing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.reporter import Reporter
+from github_team_organizer.classes.settings import settings
+from github_team_organizer.classes.sharding import is_in_shard
+
+
+logger = logging.getLogger(__name__)
+
+# Scheduler reconciling objects of the current context, objects scheduled by it need not schedule their dependencies
+current_scheduler = contextvars.ContextVar('current_scheduler', default=None)
+
+
+class DependencyCycleError(ValueError):
+    pass
+
+
+class Scheduler:
+    """
+    Dependency graph of declared objects
+
+    Every object is reconciled as soon as all objects it depends on (e.g. teams referenced by
+    a repository) are reconciled, independent objects are reconciled in parallel. A failure of
+    an object doesn't stop the run, only objects depending on it are skipped.
+    """
+
+    def __init__(self, max_workers: int = None, retries: int = None):
+        self.max_workers = max_workers or settings.jobs
+        self.retries = settings.retries if retries is None else retries
+        self.failures: typing.Dict[tuple, str] = {}
+        self.nodes: typing.Dict[tuple, BaseClass] = {}
+        self.dependencies: typing.Dict[tuple, typing.Set[tuple]] = {}
+
+    def add(self, node: BaseClass):
+        """
+        Add the object and all its dependencies, objects of other shards are left out
+        """
+        if node.identity in self.nodes or not is_in_shard(node.identity):
+            return self
+
+        self.nodes[node.identity] = node
+        self.dependencies[node.identity] = set()
+        for dependency in node.dependencies:
+            self.add(dependency)
+            if dependency.identity in self.nodes:
+                self.dependencies[node.identity].add(dependency.identity)
+        return self
+
+    def run(self):
+        """
+        Reconcile all objects, failed objects and objects depending on them are retried
+        in up to ``retries`` additional passes
+
+        Failures left after the last pass are kept in ``failures``.
+        """
+        pending = set(self.nodes)
+        token = current_scheduler.set(self)
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    Reporter().secho(f'Retrying {len(pending)} failed objects (attempt {attempt + 1})...', bg='yellow')
+                pending = self.run_pass(pending)
+                if not pending:
+                    break
+        finally:
+            current_scheduler.reset(token)
+        return self
+
+    def run_pass(self, keys: typing.Set[tuple]) -> typing.Set[tuple]:
+        """
+        Reconcile passed objects, dependencies outside of them are treated as reconciled
+
+        :return: keys of failed objects and objects blocked by them
+        """
+        remaining = {key: self.dependencies[key] & keys for key in keys}
+        dependents = defaultdict(set)
+        for key, dependencies in remaining.items():
+            for dependency in dependencies:
+                dependents[dependency].add(key)
+
+        completed = set()
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(key):
+                node = self.nodes[key]
+                Reporter().secho(f'Processing {node.kind} {node.name}...', bg='blue')
+                futures[executor.submit(contextvars.copy_context().run, node.reconcile)] = key
+
+            futures = {}
+            for key in [k for k, dependencies in remaining.items() if not dependencies]:
+                submit(key)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = futures.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.debug(f'Reconciliation of {"/".join(key)} failed', exc_info=True)
+                        Reporter().secho(f'Failed to process {key[1]} {key[2]}: {e}', bold=True, bg='red')
+                        failed[key] = f'{e.__class__.__name__}: {e}'
+                        continue
+
+                    completed.add(key)
+                    for dependent in dependents[key]:
+                        remaining[dependent].discard(key)
+                        if not remaining[dependent]:
+                            submit(dependent)
+
+        blocked = {}
+        queue = list(failed)
+        while queue:
+            key = queue.pop()
+            for dependent in dependents[key]:
+                if dependent not in blocked and dependent not in failed:
+                    blocked[dependent] = f'Dependency {"/".join(key)} failed'
+                    queue.append(dependent)
+
+        unprocessed = keys - completed - failed.keys() - blocked.keys()
+        if unprocessed:
+            blocked_by_cycle = ', '.join('/'.join(key) for key in sorted(unprocessed))
+            raise DependencyCycleError(f'Dependency cycle detected between: {blocked_by_cycle}')
+
+        for key in completed:
+            self.failures.pop(key, None)
+        self.failures.update(failed)
+        self.failures.update(blocked)
+        return set(failed) | set(blocked)
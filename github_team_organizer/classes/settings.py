@@ -5,6 +5,15 @@ import dataclasses
 class Settings:
 
     apply: bool = False
+    skip_archived: bool = False
+    skip_forks: bool = False
+    jobs: int = 4
+    shard_index: int = 0
+    shard_count: int = 1
+    offline: bool = False
+    retries: int = 1
+    cache: bool = True
+    per_page: int = 100
 
 
 settings = Settings()
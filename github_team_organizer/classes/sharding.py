@@ -0,0 +1,18 @@
+import hashlib
+import typing
+
+from github_team_organizer.classes.settings import settings
+
+
+def get_shard(identity: typing.Tuple[str, ...], shard_count: int) -> int:
+    """
+    Stable shard number of an object, the same in every process and on every machine
+    """
+    digest = hashlib.sha1('/'.join(identity).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count
+
+
+def is_in_shard(identity: typing.Tuple[str, ...]) -> bool:
+    if settings.shard_count <= 1:
+        return True
+    return get_shard(identity, settings.shard_count) == settings.shard_index
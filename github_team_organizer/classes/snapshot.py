@@ -0,0 +1,230 @@
+import dataclasses
+import gzip
+import json
+import sys
+import typing
+
+
+SNAPSHOT_VERSION = 1
+
+
+def slotted(cls):
+    """
+    Recreate the dataclass with ``__slots__``, so its instances have no ``__dict__``
+
+    ``dataclass(slots=True)`` is available only since Python 3.10.
+    """
+    names = tuple(f.name for f in dataclasses.fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names + ('__dict__', '__weakref__')}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def intern_keys(mapping: typing.Dict[str, str]) -> typing.Dict[str, str]:
+    """
+    Intern keys and values of a string mapping, logins, slugs and permissions repeat across records
+    """
+    return {sys.intern(k): sys.intern(v) for k, v in mapping.items()}
+
+
+def intern_optional(value: typing.Optional[str]) -> typing.Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+@slotted
+@dataclasses.dataclass
+class TeamSnapshot:
+
+    slug: str
+    name: str
+    description: str = ''
+    privacy: str = 'closed'
+    node_id: typing.Optional[str] = None
+    # login -> 'member' or 'maintainer'
+    members: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    # repository name -> REST permission name
+    repositories: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    parent: typing.Optional[str] = None
+
+    def __post_init__(self):
+        self.slug = sys.intern(self.slug)
+        self.privacy = sys.intern(self.privacy)
+        self.members = intern_keys(self.members)
+        self.repositories = intern_keys(self.repositories)
+        self.parent = intern_optional(self.parent)
+
+    def get_members(self, role: str) -> typing.List[str]:
+        return [login for login, member_role in self.members.items() if member_role == role]
+
+
+@slotted
+@dataclasses.dataclass
+class ProtectionRuleSnapshot:
+
+    pattern: str
+    node_id: typing.Optional[str] = None
+    settings: dict = dataclasses.field(default_factory=dict)
+
+
+@slotted
+@dataclasses.dataclass
+class RepositorySnapshot:
+
+    name: str
+    is_archived: bool = False
+    is_fork: bool = False
+    default_branch_name: typing.Optional[str] = None
+    updated_at: typing.Optional[str] = None
+    # team slug -> REST permission name ('pull', 'triage', 'push', 'maintain', 'admin')
+    teams: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    collaborators: typing.Tuple[str, ...] = ()
+    protection_rules: typing.Dict[str, ProtectionRuleSnapshot] = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        self.name = sys.intern(self.name)
+        self.default_branch_name = intern_optional(self.default_branch_name)
+        self.teams = intern_keys(self.teams)
+        self.collaborators = tuple(sys.intern(login) for login in self.collaborators)
+
+
+@dataclasses.dataclass
+class OrganizationSnapshot:
+
+    login: str
+    teams: typing.Dict[str, TeamSnapshot] = dataclasses.field(default_factory=dict)
+    repositories: typing.Dict[str, RepositorySnapshot] = dataclasses.field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'OrganizationSnapshot':
+        organization = cls(login=data['login'])
+        for t in data.get('teams', []):
+            organization.teams[t['slug']] = TeamSnapshot(**t)
+        for r in data.get('repositories', []):
+            rules = {p['pattern']: ProtectionRuleSnapshot(**p) for p in r.pop('protection_rules', [])}
+            organization.repositories[r['name']] = RepositorySnapshot(**r, protection_rules=rules)
+        return organization
+
+    def as_dict(self) -> dict:
+        return {
+            'login': self.login,
+            'teams': [dataclasses.asdict(t) for t in self.teams.values()],
+            'repositories': [
+                {**dataclasses.asdict(r), 'protection_rules': [dataclasses.asdict(p) for p in r.protection_rules.values()]}
+                for r in self.repositories.values()
+            ],
+        }
+
+
+def open_file(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+def is_stream_format(path: str) -> bool:
+    return path.endswith(('.jsonl', '.jsonl.gz'))
+
+
+class SnapshotWriter:
+    """
+    Writes snapshot records one per line (JSONL), so organizations are saved while they are being fetched
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open_file(self.path, 'w')
+        self.write({'type': 'snapshot', 'version': SNAPSHOT_VERSION})
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(',', ':')))
+        self.file.write('\n')
+
+    def write_organization(self, login: str):
+        self.write({'type': 'organization', 'login': login})
+
+    def write_team(self, organization: str, team: TeamSnapshot):
+        self.write({'type': 'team', 'organization': organization, **dataclasses.asdict(team)})
+
+    def write_repository(self, organization: str, repository: RepositorySnapshot):
+        self.write({
+            'type': 'repository',
+            'organization': organization,
+            **dataclasses.asdict(repository),
+            'protection_rules': [dataclasses.asdict(p) for p in repository.protection_rules.values()],
+        })
+
+
+class Snapshot:
+    """
+    Saved state of one or several organizations
+    """
+
+    def __init__(self, organizations: typing.Iterable[OrganizationSnapshot] = ()):
+        self.organizations: typing.Dict[str, OrganizationSnapshot] = {o.login: o for o in organizations}
+
+    def get_organization(self, login: str) -> OrganizationSnapshot:
+        if login not in self.organizations:
+            raise KeyError(f'Organization {login} is not found in the snapshot')
+        return self.organizations[login]
+
+    @classmethod
+    def load(cls, path: str) -> 'Snapshot':
+        """
+        Load snapshot from a JSON document or a JSONL stream, both optionally gzip-compressed
+        """
+        if is_stream_format(path):
+            return cls.load_stream(path)
+
+        with open_file(path, 'r') as f:
+            data = json.load(f)
+
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f'Unsupported snapshot version: {data.get("version")}')
+        return cls(OrganizationSnapshot.from_dict(o) for o in data['organizations'])
+
+    @classmethod
+    def load_stream(cls, path: str) -> 'Snapshot':
+        snapshot = cls()
+        with open_file(path, 'r') as f:
+            for number, line in enumerate(f):
+                record = json.loads(line)
+                record_type = record.pop('type')
+
+                if number == 0:
+                    if record_type != 'snapshot' or record.get('version') != SNAPSHOT_VERSION:
+                        raise ValueError(f'Unsupported snapshot header: {line.strip()}')
+                elif record_type == 'organization':
+                    snapshot.organizations[record['login']] = OrganizationSnapshot(login=record['login'])
+                elif record_type == 'team':
+                    organization = snapshot.organizations[record.pop('organization')]
+                    organization.teams[record['slug']] = TeamSnapshot(**record)
+                elif record_type == 'repository':
+                    organization = snapshot.organizations[record.pop('organization')]
+                    rules = {p['pattern']: ProtectionRuleSnapshot(**p) for p in record.pop('protection_rules')}
+                    organization.repositories[record['name']] = RepositorySnapshot(**record, protection_rules=rules)
+
+        return snapshot
+
+    def save(self, path: str):
+        if is_stream_format(path):
+            with SnapshotWriter(path) as writer:
+                for organization in self.organizations.values():
+                    writer.write_organization(organization.login)
+                    for team in organization.teams.values():
+                        writer.write_team(organization.login, team)
+                    for repository in organization.repositories.values():
+                        writer.write_repository(organization.login, repository)
+            return
+
+        with open_file(path, 'w') as f:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'organizations': [o.as_dict() for o in self.organizations.values()],
+            }, f)
@@ -2,19 +2,21 @@ import logging
 import typing
 from collections.abc import Iterable
 
-from cached_property import cached_property
+from cached_property import threaded_cached_property
 from github import Github as PyGithub
 from github.GithubObject import NotSet
 from github.NamedUser import NamedUser
 from github.Organization import Organization
 from github.Team import Team
-from sgqlc.operation import Operation
 
-from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.base import BaseClass, DuplicateDeclarationError
 from github_team_organizer.classes.github import GitHubWrapper
-from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.membership import GitHubTeamMembership
+from github_team_organizer.classes.pagination import fetch_all
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.resolver import GitHubTeamResolver, GitHubUserResolver
 from github_team_organizer.classes.settings import settings
-from github_team_organizer.graphql.github_schema import github_schema as schema
+from github_team_organizer.classes.sharding import is_in_shard
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +24,10 @@ logger = logging.getLogger(__name__)
 
 class GitHubTeam(BaseClass):
 
+    kind = 'team'
+
+    remote_attributes = ('obj', 'gq_node_id')
+
     def __init__(
             self,
 
@@ -31,9 +37,10 @@ class GitHubTeam(BaseClass):
 
             team_maintainers: typing.List[typing.Union[str, NamedUser]] = None,
             team_members: typing.List[typing.Union[str, NamedUser]] = None,
+            parent_team: typing.Optional['GitHubTeam'] = NotSet,
 
             github: PyGithub = None,
-            organization: Organization = None
+            organization: typing.Union[str, Organization] = None
     ):
         super().__init__()
 
@@ -41,11 +48,13 @@ class GitHubTeam(BaseClass):
         self._team_members = []
 
         self.github = github if github else GitHubWrapper()
-        self.organization = organization if organization else GitHubWrapper().default_organization
+        self.set_organization(organization)
 
         self.name = name
         self.description = description
         self.privacy = privacy if privacy else NotSet
+        # NotSet leaves the parent unmanaged, None makes the team a root one
+        self.parent_team = parent_team
 
         self.team_maintainers = team_maintainers
         self.team_members = team_members
@@ -53,28 +62,68 @@ class GitHubTeam(BaseClass):
     def __str__(self):
         return f'{self.__class__.__name__} "{self.name}": {self.obj}'
 
+    @property
+    def parent_name(self) -> typing.Optional[str]:
+        return self.parent_team.name if isinstance(self.parent_team, GitHubTeam) else None
+
+    @property
+    def dependencies(self) -> typing.List['GitHubTeam']:
+        return [self.parent_team] if isinstance(self.parent_team, GitHubTeam) else []
+
+    def merge(self, other: 'GitHubTeam'):
+        if (other.description, other.privacy) != (self.description, self.privacy):
+            raise DuplicateDeclarationError(f'Team {self.name} is declared twice with different settings')
+        if other.parent_team is not NotSet:
+            if self.parent_team is not NotSet and other.parent_name != self.parent_name:
+                raise DuplicateDeclarationError(f'Team {self.name} is declared twice with different parents')
+            self.parent_team = other.parent_team
+
+        for member in other.team_maintainers:
+            if member not in self._team_maintainers:
+                self._team_maintainers.append(member)
+        for member in other.team_members:
+            if member not in self._team_members:
+                self._team_members.append(member)
+
     def run(self):
+        self.sync_parent()
         self.sync_team_members('maintainer', self.team_maintainers)
         self.sync_team_members('member', self.team_members)
         return self
 
-    @cached_property
-    def obj(self) -> Team:
-        for org_team in self.organization.get_teams():  # type:Team
-            if org_team.name == self.name:
-                if org_team.description != self.description or org_team.privacy != self.privacy:
-                    logger.warning(f'Team {self.name} meta should be updated...')
-                    if settings.apply:
-                        org_team.edit(
-                            self.name,
-                            self.description,
-                            privacy=self.privacy
-                        )
-                    else:
-                        logger.info(f' ... skipping')
-                return org_team
+    @threaded_cached_property
+    def obj(self) -> typing.Optional[Team]:
+        """
+        Team of the organization, created or updated on the first access
+
+        Teams of other shards are only read, they are created and updated by their own shards,
+        so ``None`` is returned for such a team which doesn't exist yet.
+        """
+        org_team = self.github.get_cached_teams(self.organization_login).get(self.name)
+        if not is_in_shard(self.identity):
+            return org_team
+        if org_team is not None:
+            if org_team.description != self.description or org_team.privacy != self.privacy:
+                logger.warning(f'Team {self.name} meta should be updated...')
+                privacy = self.privacy if self.privacy is not NotSet else None
+                Plan().record(
+                    self.identity, 'update_team',
+                    before={'description': org_team.description, 'privacy': org_team.privacy},
+                    after={'description': self.description, 'privacy': privacy},
+                    description=self.description, privacy=privacy,
+                )
+                if settings.apply:
+                    org_team.edit(
+                        self.name,
+                        self.description,
+                        privacy=self.privacy
+                    )
+                else:
+                    logger.info(f' ... skipping')
+            return org_team
 
         logger.warning(f'Team {self.name} not found, should be created...')
+        Plan().record(self.identity, 'create_team')
         if settings.apply:
             org_team = self.organization.create_team(
                 self.name,
@@ -88,20 +137,48 @@ class GitHubTeam(BaseClass):
             logger.info(f' ... created')
             return org_team
 
-    @cached_property
+    def sync_parent(self):
+        """
+        Set the declared parent team, the actual one is taken from the team tree of the organization
+        """
+        if self.parent_team is NotSet or not self.obj:
+            return self
+
+        # Teams are compared by slugs, which differ from names with spaces, capital letters or slashes
+        membership = GitHubTeamMembership(self.organization_login)
+        if membership.is_fetched():
+            actual_parent = membership.tree.get_parent(self.obj.slug)
+        else:
+            actual_parent = self.obj.parent.slug if self.obj.parent else None
+        # A parent which doesn't exist yet has no slug and can't be the actual parent
+        parent = self.parent_team.obj if self.parent_name else None
+        declared_parent = parent.slug if parent else self.parent_name
+
+        if actual_parent != declared_parent:
+            logger.warning(f'Team {self.name} should be moved from parent {actual_parent} to {self.parent_name}')
+            Plan().record(
+                self.identity, 'set_parent', before={'parent': actual_parent}, after={'parent': self.parent_name},
+                parent=self.parent_name,
+            )
+            if settings.apply and self.parent_name and self.parent_team.obj is None:
+                logger.warning(f'Parent team {self.parent_name} of {self.name} does not exist yet, skipping')
+            elif settings.apply:
+                self.obj._requester.requestJsonAndCheck('PATCH', self.obj.url, input={
+                    'name': self.obj.name,
+                    'parent_team_id': self.parent_team.obj.id if self.parent_name else None,
+                })
+        return self
+
+    @threaded_cached_property
     def gq_node_id(self) -> str:
-        op = Operation(schema.Query)
-        t = op.organization(login=self.organization.login).team(slug=self.name)
-        t.id()
-        data = GitHubGraphQL().call(op)
-        return (op + data).organization.team.id
+        return GitHubTeamResolver(self.organization_login).get_node_id(self.name)
 
     @property
-    def team_members(self) -> typing.List[NamedUser]:
+    def team_members(self) -> typing.List[str]:
         return self._team_members
 
     @property
-    def team_maintainers(self) -> typing.List[NamedUser]:
+    def team_maintainers(self) -> typing.List[str]:
         return self._team_maintainers
 
     @team_members.setter
@@ -110,7 +187,7 @@ class GitHubTeam(BaseClass):
             for m in value:
                 self.add_member(self._team_members, m)
         else:
-            logger.info(f'No members for team {self}')
+            logger.info(f'No members for team {self.name}')
             # raise ValueError(f"Should be a list of users")
 
     @team_maintainers.setter
@@ -119,42 +196,61 @@ class GitHubTeam(BaseClass):
             for m in value:
                 self.add_member(self._team_maintainers, m)
         else:
-            logger.info(f'No maintainers for team {self}')
+            logger.info(f'No maintainers for team {self.name}')
             # raise ValueError(f"Should be a list of users")
 
-    def add_member(self, member_list: typing.List[NamedUser], member):
+    def add_member(self, member_list: typing.List[str], member):
+        """
+        Add member login to the list, users are not requested until the team is reconciled
+        """
         if isinstance(member, str):
-            member_list.append(self.github.get_user(member))
+            login = member.lower()
         elif isinstance(member, NamedUser):
-            member_list.append(member)
+            login = member.login.lower()
         else:
             raise ValueError(f'Wrong team member passed: {member}')
 
-    def sync_team_members(self, member_type: str, member_list: typing.List[NamedUser]):
+        if login not in member_list:
+            member_list.append(login)
+
+    def sync_team_members(self, member_type: str, member_list: typing.List[str]):
         """
         Synchronize defined and real team members
 
+        Actual members are taken from the org-wide membership fetch when it was done,
+        otherwise they are requested from REST API.
+
         :param member_type: str = 'member' or 'maintainer'
-        :param member_list:
+        :param member_list: logins of members
         :return:
         """
         if not self.obj:
             logger.warning(f'Team {self.name} has no reference, exiting...')
             return self
 
+        membership = GitHubTeamMembership(self.organization_login)
+        if membership.is_fetched():
+            actual_members = membership.get_members(self.obj.slug, member_type)
+        else:
+            actual_members = [m.login.lower() for m in fetch_all(self.obj.get_members(member_type))]
+
         # Remove unlisted members
-        for actual_member in self.obj.get_members(member_type):  # type:NamedUser
+        for actual_member in actual_members:
             if actual_member not in member_list:
-                logger.warning(f'Found wrong {member_type} {actual_member} in team {self.obj}, removing')
+                logger.warning(f'Found wrong {member_type} {actual_member} in team {self.name}, removing')
+                Plan().record(self.identity, 'remove_member', role=member_type, login=actual_member)
                 if settings.apply:
-                    self.obj.remove_membership(actual_member)
+                    self.obj.remove_membership(self.github.get_lazy_user(actual_member))
 
         # Add required members
-        actual_members = self.obj.get_members(member_type)
         for team_member in member_list:
             if team_member not in actual_members:
-                logger.warning(f'Not found {member_type} {team_member} in team {self.obj}, adding')
+                if GitHubUserResolver().is_unknown(team_member):
+                    logger.warning(f'Unknown {member_type} {team_member} of team {self.name}, skipping')
+                    continue
+                logger.warning(f'Not found {member_type} {team_member} in team {self.name}, adding')
+                Plan().record(self.identity, 'add_member', role=member_type, login=team_member)
                 if settings.apply:
-                    self.obj.add_membership(team_member, member_type)
+                    self.obj.add_membership(self.github.get_lazy_user(team_member), member_type)
 
         return self
@@ -0,0 +1,73 @@
+import contextvars
+import logging
+import os
+import threading
+import typing
+
+from github_team_organizer.classes.ratelimit import RateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+
+# Token which sent write requests in the current context, e.g. during reconciliation of a single object
+write_token = contextvars.ContextVar('write_token', default=None)
+
+
+class TokenPool:
+    """
+    API tokens requests are distributed across, set as a comma-separated ``GITHUB_API_KEY``
+
+    Every request is sent with the token which has the largest remaining budget of the resource, tokens
+    with exhausted budgets are left out until their reset time. Write requests stick to the token which
+    sent the first write of the context, so changes of an object are made on behalf of a single token.
+    """
+
+    __instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if TokenPool.__instance is None:
+            TokenPool.__instance = super().__new__(cls)
+        return TokenPool.__instance
+
+    def __init__(self, tokens: typing.List[str] = None):
+        if not hasattr(self, 'tokens'):
+            self.tokens = tokens or [t.strip() for t in os.getenv('GITHUB_API_KEY', '').split(',') if t.strip()]
+            self._excluded = set()
+            self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.tokens) > 1
+
+    def get_remaining(self, resource: str, token: str) -> float:
+        budget = RateLimiter().get_budget(resource, token)
+        # Tokens which were not used yet are preferred, their budgets are unknown
+        return float('inf') if budget.remaining < 0 else budget.remaining
+
+    def select(self, resource: str, write: bool = False) -> str:
+        limiter = RateLimiter()
+        sticky = write_token.get() if write else None
+        if sticky is not None and not limiter.is_exhausted(resource, sticky):
+            return sticky
+
+        with self._lock:
+            available = [t for t in self.tokens if not limiter.is_exhausted(resource, t)]
+            self.log_exclusions(resource, available)
+            if available:
+                token = max(available, key=lambda t: self.get_remaining(resource, t))
+            else:
+                # Every token is exhausted, the request waits for the earliest reset in the rate limiter
+                token = min(self.tokens, key=lambda t: limiter.get_budget(resource, t).reset_time)
+
+        if write:
+            write_token.set(token)
+        return token
+
+    def log_exclusions(self, resource: str, available: typing.List[str]):
+        excluded = {(resource, i) for i, t in enumerate(self.tokens) if t not in available}
+        for key in sorted(excluded - self._excluded):
+            logger.warning(f'Token #{key[1] + 1} is exhausted for {resource}, excluded until reset')
+        for key in sorted(k for k in self._excluded - excluded if k[0] == resource):
+            logger.info(f'Token #{key[1] + 1} is available again for {resource}')
+        self._excluded = {k for k in self._excluded if k[0] != resource} | excluded
@@ -0,0 +1,97 @@
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import typing
+
+
+# Span of the current context, parent of spans started in it
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+
+    def __init__(self, span_id: int, parent_id: typing.Optional[int], name: str, category: str, attributes: dict):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+
+class Tracer:
+    """
+    Spans of the run (run → phase → object → API call) exported in the Chrome trace event format
+
+    The file can be opened in Perfetto (https://ui.perfetto.dev) or ``chrome://tracing``, spans
+    are drawn per thread and keep ids of their parent spans in arguments.
+    """
+
+    __instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if Tracer.__instance is None:
+            Tracer.__instance = super().__new__(cls)
+            Tracer.__instance.enabled = False
+            Tracer.__instance.events = []
+            Tracer.__instance.threads = {}
+            Tracer.__instance._ids = itertools.count(1)
+            Tracer.__instance._lock = threading.Lock()
+        return Tracer.__instance
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns() // 1000
+
+    def get_thread_id(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self.threads:
+                self.threads[ident] = (len(self.threads) + 1, threading.current_thread().name)
+            return self.threads[ident][0]
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **attributes):
+        if not self.enabled:
+            yield Span(0, None, name, category, attributes)
+            return
+
+        parent = current_span.get()
+        span = Span(next(self._ids), parent.span_id if parent else None, name, category, attributes)
+        token = current_span.set(span)
+        started = self.now()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f'{e.__class__.__name__}: {e}')
+            raise
+        finally:
+            duration = self.now() - started
+            current_span.reset(token)
+            event = {
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': started,
+                'dur': duration,
+                'pid': os.getpid(),
+                'tid': self.get_thread_id(),
+                'args': {'span_id': span.span_id, 'parent_id': span.parent_id, **span.attributes},
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def write(self, path: str):
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+            for tid, name in self.threads.values()
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f, default=str)
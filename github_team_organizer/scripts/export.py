@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import os
+import time
+
+import click
+from dotenv import load_dotenv, find_dotenv
+
+from github_team_organizer.classes.exporter import SnapshotExporter
+from github_team_organizer.classes.snapshot import SnapshotWriter, is_stream_format
+
+load_dotenv(find_dotenv(usecwd=True), verbose=True)
+
+
+@click.command(help='Export GitHub Organization state to a snapshot')
+@click.option(
+    '--org', '-o', multiple=True,
+    default=[o.strip() for o in os.getenv('GITHUB_ORGANIZATION', '').split(',') if o.strip()],
+    help='GitHub Organization, can be passed several times'
+)
+@click.option('--output', '-O', required=True, type=click.Path(dir_okay=False), help='Snapshot file (.jsonl or .jsonl.gz)')
+def run(org, output):
+    if not org:
+        raise click.UsageError('At least one organization should be set')
+    if not is_stream_format(output):
+        raise click.UsageError('Snapshot file should have .jsonl or .jsonl.gz extension')
+
+    with SnapshotWriter(output) as writer:
+        for organization in org:
+            started = time.monotonic()
+            exporter = SnapshotExporter(organization)
+            writer.write_organization(organization)
+
+            teams = []
+            for team in exporter.fetch_teams():
+                writer.write_team(organization, team)
+                teams.append(team)
+
+            repositories = 0
+            for repository in exporter.fetch_repositories(teams):
+                writer.write_repository(organization, repository)
+                repositories += 1
+
+            click.echo(
+                f'Exported {len(teams)} teams and {repositories} repositories of {organization} '
+                f'in {time.monotonic() - started:.1f}s'
+            )
+
+    click.echo(f'Snapshot is written to {output}')
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+import collections
+
+import click
+
+from github_team_organizer.classes.report import get_missing_shards, merge_reports, read_report, write_report
+
+
+@click.command(help='Merge reports of sharded GitHub Config Applier runs')
+@click.argument('reports', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-O', required=True, type=click.Path(dir_okay=False), help='Merged report file')
+def run(reports, output):
+    try:
+        report = merge_reports([read_report(path) for path in reports])
+        missing_shards = get_missing_shards(report)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if missing_shards:
+        click.secho(f'Reports of shards {", ".join(map(str, missing_shards))} are missing', bold=True, bg='yellow')
+
+    write_report(output, report)
+
+    actions = collections.Counter(item['action'] for item in report['plan'])
+    click.echo(f'Merged {len(reports)} reports of {", ".join(report["organizations"])} into {output}')
+    for action, count in sorted(actions.items()):
+        click.echo(f' - {action}: {count}')
+    if report['failures']:
+        click.secho(f'{len(report["failures"])} objects failed', bold=True, bg='red')
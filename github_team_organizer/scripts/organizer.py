@@ -1,56 +1,415 @@
 #!/usr/bin/env python
 
+import contextlib
+import contextvars
 import importlib
+import itertools
+import logging
 import os
+import runpy
 import sys
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 from dotenv import load_dotenv, find_dotenv
 
-from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes import declarative
+from github_team_organizer.classes.base import BaseClass
+from github_team_organizer.classes.collaborators import GitHubCollaboratorScanner
+from github_team_organizer.classes.connection import ConditionalRequestCache
+from github_team_organizer.classes.discovery import GitHubRepositoryDiscovery
+from github_team_organizer.classes.github import GitHubWrapper, organization_login
+from github_team_organizer.classes.membership import GitHubTeamMembership
+from github_team_organizer.classes.offline import OfflinePlanner, load_organization
+from github_team_organizer.classes.orgmembers import GitHubOrganizationMembers
+from github_team_organizer.classes.plan import Plan
+from github_team_organizer.classes.profiler import Profiler
 from github_team_organizer.classes.project import GitHubProject
+from github_team_organizer.classes.ratelimit import RateLimiter
+from github_team_organizer.classes.reporter import Reporter
 from github_team_organizer.classes.settings import settings
+from github_team_organizer.classes.sharding import is_in_shard
+from github_team_organizer.classes.snapshot import Snapshot
 from github_team_organizer.classes.team import GitHubTeam
+from github_team_organizer.classes.tracing import Tracer
+from github_team_organizer.classes.report import build_report, write_report
 from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.resolver import GitHubTeamResolver, GitHubUserResolver
+from github_team_organizer.classes.scheduler import Scheduler
 
 sys.path.append(os.getcwd())
 load_dotenv(find_dotenv(usecwd=True), verbose=True)
 
+logger = logging.getLogger(__name__)
+
+# Organizations with imported configs, configs are imported once per process
+configured_organizations = set()
+
+# Python config modules which were already imported for an organization
+imported_config_modules = set()
+imported_config_modules_lock = threading.Lock()
+
+
+def get_config_module(organization: str, config_modules: typing.Dict[str, str]) -> str:
+    if organization in config_modules:
+        return config_modules[organization]
+    if None in config_modules:
+        return config_modules[None]
+    if len(settings.org) == 1:
+        return 'config'
+    return 'config_' + organization.replace('-', '_').lower()
+
+
+@contextlib.contextmanager
+def phase(name: str, **attributes):
+    with Tracer().span(name, 'phase', **attributes), Profiler().phase(name):
+        yield
+
+
+def prepare_organization(
+        organization: str, config_module: str, snapshot: Snapshot = None, stale_repositories: typing.Set[str] = None
+) -> GitHubRepositoryDiscovery:
+    """
+    Discover repositories, import config, resolve declared users and teams in batches
+    and scan collaborators of a single organization
+
+    Should be executed in a separate context, as objects declared in the config are bound
+    to the organization of the current context. With a snapshot repositories and collaborators
+    are taken from it and nothing is requested from the API. On next cycles of the watch mode ``stale_repositories``
+    are passed and the state fetched during the previous cycle is requested again, see ``refresh_organization``.
+    """
+    organization_login.set(organization)
+
+    with phase('discovery', organization=organization):
+        if snapshot:
+            discovery = load_organization(snapshot.get_organization(organization))
+        else:
+            discovery = GitHubRepositoryDiscovery(organization)
+            if stale_repositories is not None:
+                discovery.refresh()
+            discovery.all_repositories
+
+    if stale_repositories is not None and not snapshot:
+        refresh_organization(organization, discovery.changed_repositories | stale_repositories)
+
+    if organization not in configured_organizations:
+        with phase('config', organization=organization):
+            if declarative.is_declarative_config(config_module):
+                declarative.load(config_module, organization, use_cache=settings.cache)
+            else:
+                import_config_module(config_module)
+        configured_organizations.add(organization)
+
+    if not snapshot:
+        with phase('resolve', organization=organization):
+            teams = [t for t in GitHubTeam.instances() if t.organization_login == organization]
+            GitHubTeamResolver(organization).resolve(t.name for t in teams)
+            GitHubUserResolver().resolve(login for t in teams for login in t.team_maintainers + t.team_members)
+            GitHubUserResolver().resolve(
+                login for m in GitHubOrganizationMembers.instances() if m.organization_login == organization
+                for login in (m.admins or []) + m.members
+            )
+
+        if any(is_in_shard(t.identity) for t in teams):
+            with phase('membership', organization=organization):
+                GitHubTeamMembership(organization).fetch()
+
+    if discovery.skipped_repositories:
+        Reporter().secho(
+            f'Skipping {len(discovery.skipped_repositories)} archived/forked repositories in {organization}',
+            fg='black'
+        )
+
+    repositories = [name for name in discovery.repositories if is_in_shard((organization, 'repository', name))]
+    if not snapshot:
+        Reporter().secho(
+            f'Scanning direct collaborators of {len(repositories)} repositories in {organization}...', bg='blue'
+        )
+    with phase('collaborators', organization=organization):
+        GitHubCollaboratorScanner(organization).scan(repositories)
+    GitHubCollaboratorScanner(organization).print_report()
+
+    return discovery
+
+
+def import_config_module(config_module: str):
+    """
+    Import the config module, a module shared by several organizations is executed again for each of them
+
+    An imported module is not executed by a repeated import, so its objects would be declared
+    for the first organization only.
+    """
+    with imported_config_modules_lock:
+        is_imported = config_module in imported_config_modules
+        imported_config_modules.add(config_module)
+
+    if is_imported:
+        runpy.run_module(config_module, run_name=config_module)
+    else:
+        importlib.import_module(config_module)
+
+
+def refresh_organization(organization: str, repository_names: typing.Set[str]):
+    """
+    Forget the state of the organization fetched during the previous cycle, declared objects and resolved IDs are kept
+
+    Collaborators and team permissions of every repository are requested again, as adding them doesn't change
+    ``updatedAt`` of the repository (teams are listed conditionally, so unchanged lists cost no rate limit). Settings
+    and protection rules are requested again only for the passed repositories: the ones updated since the previous
+    discovery and the ones changed or failed by the previous cycle.
+    """
+    GitHubCollaboratorScanner(organization).refresh()
+    GitHubTeamMembership(organization).refresh()
+    GitHubWrapper().refresh(organization)
+    for r in GitHubRepositoryWrapper.instances():
+        if r.organization_login != organization:
+            continue
+        if r.name in repository_names:
+            r.refresh()
+        else:
+            r.refresh_teams()
+
 
 @click.command(help='GitHub Config Applier')
 @click.option('--api-key', '-k', default=os.getenv('GITHUB_API_KEY'), help='GitHub API Key')
-@click.option('--org', '-o', default=os.getenv('GITHUB_ORGANIZATION'), help='GitHub Organization')
+@click.option(
+    '--org', '-o', multiple=True,
+    default=[o.strip() for o in os.getenv('GITHUB_ORGANIZATION', '').split(',') if o.strip()],
+    help='GitHub Organization, can be passed several times'
+)
+@click.option(
+    '--config', '-c', 'config_modules', multiple=True, metavar='[ORG=]MODULE',
+    help='Config module or YAML/TOML file of the organization, '
+         '"config" for a single organization and "config_<org>" otherwise'
+)
 @click.option('--apply/--test', '-a/-t', default=False, help='Perform changes or just test them')
-def run(**kwargs):
+@click.option('--skip-archived/--include-archived', default=False, help='Skip archived repositories entirely')
+@click.option('--skip-forks/--include-forks', default=False, help='Skip forked repositories entirely')
+@click.option('--jobs', '-j', default=4, type=click.IntRange(min=1), help='Number of objects reconciled in parallel')
+@click.option('--shard-index', default=0, type=click.IntRange(min=0), help='Index of the shard processed by this run')
+@click.option('--shard-count', default=1, type=click.IntRange(min=1), help='Number of shards objects are split into')
+@click.option(
+    '--retries', default=1, type=click.IntRange(min=0), help='Number of retry passes over objects which failed'
+)
+@click.option(
+    '--per-page', default=100, type=click.IntRange(min=1, max=100), help='Number of items per page of REST API lists'
+)
+@click.option('--cache/--no-cache', default=True, help='Use on-disk caches of compiled configs and user IDs')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='Write JSON report of the run to the file')
+@click.option('--offline', is_flag=True, default=False, help='Compute the plan against a snapshot without API requests')
+@click.option('--snapshot', 'snapshot_path', type=click.Path(exists=True, dir_okay=False), help='Snapshot for --offline')
+@click.option(
+    '--events', 'events_path', type=click.Path(dir_okay=False, allow_dash=True),
+    help='Stream JSONL events of the run to the file, "-" for stdout'
+)
+@click.option('--quiet', '-q', is_flag=True, default=False, help='Do not print human-readable progress')
+@click.option(
+    '--profile', 'profile_path', type=click.Path(file_okay=False),
+    help='Profile every phase of the run and write profiles to the directory'
+)
+@click.option('--trace', 'trace_path', type=click.Path(dir_okay=False), help='Write spans of the run in trace event format')
+@click.option(
+    '--watch', 'watch_interval', type=click.IntRange(min=1), metavar='SECONDS',
+    help='Keep running and reconcile again every SECONDS'
+)
+def run(
+        config_modules, report_path, snapshot_path, events_path, quiet, profile_path, trace_path, watch_interval,
+        **kwargs
+):
     for k, v in kwargs.items():
         setattr(settings, k, v)
 
-    all_repositories = [
-        r.full_name
-        for r in GitHubWrapper().default_organization.get_repos(type='all')
-    ]
+    if not settings.org:
+        raise click.UsageError('At least one organization should be set')
+    if settings.shard_index >= settings.shard_count:
+        raise click.UsageError('--shard-index should be less than --shard-count')
+    if settings.offline and not snapshot_path:
+        raise click.UsageError('--offline mode requires --snapshot')
+    if settings.offline and settings.apply:
+        raise click.UsageError('--offline mode can not be combined with --apply')
+    if settings.offline and watch_interval:
+        raise click.UsageError('--offline mode can not be combined with --watch')
+    if watch_interval and (profile_path or trace_path):
+        # Profiles and spans are written once the process exits, so they would grow with every cycle
+        raise click.UsageError('--watch can not be combined with --profile or --trace')
+    config_modules = dict(c.split('=', 1) if '=' in c else (None, c) for c in config_modules)
+    snapshot = Snapshot.load(snapshot_path) if settings.offline else None
+
+    reporter = Reporter().open(events_path, human=not quiet)
+    Profiler().enabled = bool(profile_path)
+    Tracer().enabled = bool(trace_path)
+    try:
+        announce(snapshot_path)
+        if watch_interval:
+            watch(watch_interval, config_modules, report_path)
+        else:
+            with Tracer().span('run', 'run', organizations=list(settings.org), apply=settings.apply):
+                failures = execute(config_modules, report_path, snapshot)
+            if failures:
+                sys.exit(1)
+    finally:
+        if profile_path:
+            write_profile(profile_path)
+        if trace_path:
+            Tracer().write(trace_path)
+            Reporter().secho(f'Trace is written to {trace_path}')
+        reporter.close()
+
+
+def write_profile(profile_path: str):
+    summary = Profiler().write(profile_path)
+    Reporter().emit('profile', phases=summary)
+    Reporter().secho(f'Profiles are written to {profile_path}:')
+    for name, phase in summary.items():
+        Reporter().secho(
+            f' - {name}: {phase["wall"]:.2f}s wall, {phase["network"]:.2f}s network wait '
+            f'({phase["requests"]} requests), {phase["local"]:.2f}s local'
+        )
 
-    click.echo(f'Starting Team Organizer for {settings.org}...')
+
+def announce(snapshot_path: str):
+    Reporter().secho(f'Starting Team Organizer for {", ".join(settings.org)}...')
+    if settings.shard_count > 1:
+        Reporter().secho(f'Processing shard {settings.shard_index + 1} of {settings.shard_count}')
     if settings.apply:
-        click.secho(f'In apply mode script will make real changes!', fg='red')
+        Reporter().secho(f'In apply mode script will make real changes!', fg='red')
         click.pause(f'Press enter to continue...')
+    elif settings.offline:
+        Reporter().secho(f'Offline mode: planning against snapshot {snapshot_path}', fg='black')
     else:
-        click.secho(f'To apply changes - use "--apply" switch', fg='black')
+        Reporter().secho(f'To apply changes - use "--apply" switch', fg='black')
+
+
+def watch(interval: int, config_modules: typing.Dict[str, str], report_path: str):
+    """
+    Reconcile every ``interval`` seconds in a single process
+
+    Declared objects, resolved IDs and connections are kept between cycles. Responses of REST requests
+    are cached with their ETags, so reading unchanged objects again costs no rate limit.
+    """
+    ConditionalRequestCache().enabled = True
+    try:
+        for cycle in itertools.count():
+            started = time.monotonic()
+            try:
+                with Tracer().span('cycle', 'run', cycle=cycle, organizations=list(settings.org)):
+                    execute(config_modules, report_path, cycle=cycle)
+            except Exception as e:
+                # Objects failing on their own are retried by the scheduler, this is a failure of the whole cycle
+                logger.debug(f'Cycle {cycle + 1} failed', exc_info=True)
+                Reporter().secho(f'Cycle {cycle + 1} failed: {e.__class__.__name__}: {e}', bold=True, bg='red')
+
+            delay = max(interval - (time.monotonic() - started), 0)
+            Reporter().secho(
+                f'Cycle {cycle + 1} is finished, {ConditionalRequestCache().hits} requests were not modified '
+                f'since previous cycles, next cycle in {delay:.0f}s...', fg='black'
+            )
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        Reporter().secho('Watch mode is stopped')
+
 
-    importlib.import_module('config')
+def execute(
+        config_modules: typing.Dict[str, str], report_path: str, snapshot: Snapshot = None, cycle: int = 0
+) -> typing.Dict[tuple, str]:
+    """
+    Reconcile (or plan offline) all organizations once, next cycles of the watch mode refresh fetched state first
 
-    for t in GitHubTeam.instances():  # type:GitHubTeam
-        click.secho(f'Processing team {t}...', bg='blue')
-        t.run()
+    :return: failed objects with errors
+    """
+    started = time.monotonic()
+    api_calls = RateLimiter().total_calls
+    Reporter().emit(
+        'run_started', organizations=list(settings.org), apply=settings.apply, offline=settings.offline,
+        shard_index=settings.shard_index, shard_count=settings.shard_count, cycle=cycle,
+    )
 
-    for p in GitHubProject.instances():
-        click.secho(f'Project: {p}', blink=True, bold=True, bg='blue')
-        p.run()
+    stale_repositories = None
+    if cycle:
+        # Repositories changed or failed by the previous cycle are refreshed along with repositories updated since
+        stale_repositories = {organization: set() for organization in settings.org}
+        for r in GitHubRepositoryWrapper.instances():
+            if not r.is_reconciled:
+                stale_repositories.setdefault(r.organization_login, set()).add(r.name)
+        for item in Plan().as_list():
+            if item['kind'] == GitHubRepositoryWrapper.kind:
+                stale_repositories.setdefault(item['organization'], set()).add(item['name'])
+
+        BaseClass.reset_reconciled()
+        Plan().reset()
+        for cls in (GitHubTeam, GitHubProject, GitHubOrganizationMembers):
+            for obj in cls.instances():
+                obj.refresh()
+
+    with ThreadPoolExecutor(max_workers=len(settings.org)) as executor:
+        futures = {
+            organization: executor.submit(
+                contextvars.copy_context().run,
+                prepare_organization, organization, get_config_module(organization, config_modules), snapshot,
+                None if stale_repositories is None else stale_repositories[organization],
+            )
+            for organization in settings.org
+        }
+        discoveries = {organization: future.result() for organization, future in futures.items()}
+
+    unmanaged_repositories = {
+        organization: {
+            name: r for name, r in discovery.repositories.items() if is_in_shard((organization, 'repository', name))
+        }
+        for organization, discovery in discoveries.items()
+    }
 
     for r in GitHubRepositoryWrapper.instances():
-        click.secho(f'Repository {r}', bg='blue')
-        r.run()
-        all_repositories.remove(r.full_name)
+        unmanaged_repositories.get(r.organization_login, {}).pop(r.name, None)
+
+    failures = {}
+    if settings.offline:
+        with phase('plan'):
+            objects = list(GitHubTeam.instances()) + list(GitHubRepositoryWrapper.instances())
+            OfflinePlanner(snapshot).run(objects)
+        for item in Plan().as_list():
+            details = ', '.join(f'{k}={v}' for k, v in sorted(item['details'].items()))
+            Reporter().secho(f'{item["organization"]}/{item["name"]} ({item["kind"]}): {item["action"]} {details}'.rstrip())
+    else:
+        scheduler = Scheduler()
+        for t in GitHubTeam.instances():  # type:GitHubTeam
+            scheduler.add(t)
+
+        for p in GitHubProject.instances():
+            scheduler.add(p)
+
+        for m in GitHubOrganizationMembers.instances():
+            scheduler.add(m)
+
+        for r in GitHubRepositoryWrapper.instances():
+            if not GitHubRepositoryDiscovery(r.organization_login).is_skipped_name(r.name):
+                scheduler.add(r)
+
+        with phase('reconcile'):
+            scheduler.run()
+        failures = scheduler.failures
+
+    for organization, repositories in unmanaged_repositories.items():
+        for r in repositories:
+            Reporter().emit('unmanaged_repository', object=f'{organization}/repository/{r}')
+            Reporter().secho(f'Settings for the repository: {organization}/{r} not found', bold=True, bg='yellow')
+
+    if report_path:
+        write_report(report_path, build_report(unmanaged_repositories, failures))
+        Reporter().secho(f'Report is written to {report_path}')
+
+    Reporter().emit(
+        'run_finished', duration=round(time.monotonic() - started, 3),
+        changes=len(Plan().items), api_calls=RateLimiter().total_calls - api_calls, failures=len(failures),
+        cycle=cycle,
+    )
 
-    for r in all_repositories:
-        click.secho(f'Settings for the repository: {r} not found', bold=True, bg='yellow')
+    if failures:
+        Reporter().secho(f'Failed to process {len(failures)} objects:', bold=True, bg='red')
+        for identity, error in sorted(failures.items()):
+            Reporter().emit_failed(identity, error)
+            Reporter().secho(f' - {"/".join(identity)}: {error}')
+    return failures
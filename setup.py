@@ -22,7 +22,9 @@ setup(
     long_description_content_type='text/markdown',
     entry_points={
         'console_scripts': [
-            'team-organizer = github_team_organizer.scripts.organizer:run'
+            'team-organizer = github_team_organizer.scripts.organizer:run',
+            'team-organizer-merge = github_team_organizer.scripts.merge:run',
+            'team-organizer-export = github_team_organizer.scripts.export:run',
         ]
     },
     install_requires=[
@@ -32,6 +34,11 @@ setup(
         'pygithub >= 1.47, < 1.48',
         'python-dotenv >= 0.12, < 0.13',
     ],
+    extras_require={
+        'yaml': ['pyyaml >= 5.3'],
+        'toml': ['tomli >= 1.1; python_version < "3.11"'],
+        'app': ['pyjwt[crypto]'],
+    },
     classifiers=[
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import github.MainClass
+import jwt
+
+from github_team_organizer.classes.appauth import GitHubAppAuth
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.github import GitHubWrapper
+from github_team_organizer.classes.tokenpool import TokenPool
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the token endpoint of GitHub Apps and for REST and GraphQL APIs
+    """
+
+    expires_in = 3600
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path, self.headers.get('Authorization')))
+        self.reply(200, {'login': 'acme', 'url': f'{self.server.url}/orgs/acme'})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append((self.command, self.path, self.headers.get('Authorization')))
+        if self.path == '/app/installations/7/access_tokens':
+            self.server.tokens += 1
+            expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.expires_in)
+            self.reply(201, {'token': f'ghs_{self.server.tokens}', 'expires_at': expires_at.strftime('%Y-%m-%dT%H:%M:%SZ')})
+        else:
+            self.reply(200, {'data': {'viewer': {'login': 'acme-bot'}}})
+
+
+# RS256 needs cryptography, JWTs are signed with a shared secret instead and validated by PyJWT all the same
+SECRET = 'stand-in secret of at least 32 bytes'
+
+
+def encode(payload, key, algorithm):
+    return jwt.encode(payload, SECRET, algorithm='HS256')
+
+
+class GitHubAppAuthTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.server.requests = []
+        self.server.tokens = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.patches = [
+            mock.patch.dict(os.environ, {
+                'GITHUB_API_URL': self.server.url,
+                'GITHUB_APP_ID': '1',
+                'GITHUB_APP_INSTALLATION_ID': '7',
+                'GITHUB_APP_PRIVATE_KEY': 'private key',
+            }),
+            mock.patch.object(github.MainClass, 'jwt', SimpleNamespace(encode=encode)),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.reset()
+
+    def tearDown(self):
+        self.reset()
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def reset():
+        GitHubAppAuth._GitHubAppAuth__instance = None
+        GitHubWrapper._GitHubWrapper__instance = None
+        GitHubGraphQL._GitHubGraphQL__instance = None
+        TokenPool._TokenPool__instance = None
+
+    def test_clients_are_created_without_requests(self):
+        GitHubWrapper()
+        self.assertEqual(self.server.requests, [])
+
+    def test_installation_token_is_shared_by_clients(self):
+        self.assertEqual(GitHubWrapper().get_organization('acme').login, 'acme')
+        self.assertEqual(GitHubGraphQL().call('query { viewer { login } }')['data']['viewer']['login'], 'acme-bot')
+
+        (_, path, authorization), *requests = self.server.requests
+        self.assertEqual(path, '/app/installations/7/access_tokens')
+        claims = jwt.decode(authorization.split()[1], SECRET, algorithms=['HS256'])
+        self.assertEqual(claims['iss'], '1')
+        self.assertEqual(requests, [
+            ('GET', '/orgs/acme', 'token ghs_1'),
+            ('POST', '/graphql', 'bearer ghs_1'),
+        ])
+
+    def test_token_is_refreshed_before_expiry(self):
+        with mock.patch.object(StandInHandler, 'expires_in', GitHubAppAuth.refresh_margin - 60):
+            GitHubWrapper().get_organization('acme')
+            GitHubWrapper().get_organization('acme')
+
+        self.assertEqual(self.server.tokens, 2)
+        self.assertEqual(self.server.requests[-1], ('GET', '/orgs/acme', 'token ghs_2'))
+
+    def test_installation_token_takes_precedence_over_token_pool(self):
+        with mock.patch.dict(os.environ, {'GITHUB_API_KEY': 'ghp_1,ghp_2'}):
+            GitHubWrapper().get_organization('acme')
+            GitHubGraphQL().call('query { viewer { login } }')
+
+        self.assertEqual(self.server.requests[1:], [
+            ('GET', '/orgs/acme', 'token ghs_1'),
+            ('POST', '/graphql', 'bearer ghs_1'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from github_team_organizer.classes.ghgql import GitHubGraphQL
+from github_team_organizer.classes.protection import DEFAULT_PROTECTION, ProtectionTemplate
+from github_team_organizer.classes.repository import GitHubRepositoryWrapper
+from github_team_organizer.classes.settings import settings
+
+
+class ProtectionTemplateTest(unittest.TestCase):
+
+    def test_equal_settings_give_the_same_template(self):
+        self.assertIs(
+            ProtectionTemplate.intern({'push_actor_ids': ['b', 'a', 'a']}),
+            ProtectionTemplate.intern({'push_actor_ids': ['a', 'b']}),
+        )
+
+    def test_extend_does_not_repeat_values(self):
+        template = ProtectionTemplate.intern({'required_status_check_contexts': ['ci']}).extend(
+            'required_status_check_contexts', ['ci', 'lint'],
+        )
+        self.assertEqual(template.to_input()['required_status_check_contexts'], ['ci', 'lint'])
+
+
+class ApplyProtectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.declared = {
+            'master': {'push_actor_ids': ['team-x']},
+            'release/*': {'required_status_check_contexts': ['ci']},
+        }
+        self.default = DEFAULT_PROTECTION.to_input()
+
+        self.repository = GitHubRepositoryWrapper(
+            'protection-test',
+            master_teams=[SimpleNamespace(gq_node_id='team-a'), SimpleNamespace(gq_node_id='team-x')],
+            protection=self.declared,
+            auto_cicd_protection_mode='jenkins',
+            organization='acme',
+        )
+        # Remote state: a rule of the first pattern exists, the Jenkinsfile is not empty
+        self.repository.__dict__.update(
+            obj=mock.Mock(**{'get_contents.return_value.size': 1}),
+            gq_node_id='repo-1',
+            gq_branch_protection_rules=[SimpleNamespace(id='rule-1', pattern='master')],
+        )
+
+        self.calls = []
+        self.patches = [
+            mock.patch.object(settings, 'apply', True),
+            mock.patch.object(GitHubGraphQL, 'call', lambda _, op: self.calls.append(str(op))),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_applying_patterns_keeps_declared_and_default_actors(self):
+        for pattern in ('master', 'release/*', 'master'):
+            self.repository.apply_protection(pattern)
+
+        self.assertEqual(self.declared, {
+            'master': {'push_actor_ids': ['team-x']},
+            'release/*': {'required_status_check_contexts': ['ci']},
+        })
+        self.assertEqual(DEFAULT_PROTECTION.to_input(), self.default)
+
+        master = self.repository.protection['master'].to_input()
+        self.assertEqual(master['push_actor_ids'], ['team-x'])
+        self.assertEqual(master['review_dismissal_actor_ids'], ['team-a', 'team-x'])
+        self.assertEqual(master['required_status_check_contexts'], [])
+        release = self.repository.protection['release/*'].to_input()
+        self.assertEqual(release['push_actor_ids'], ['team-a', 'team-x'])
+        self.assertEqual(release['required_status_check_contexts'], ['ci'])
+
+        first, second, third = self.calls
+        self.assertEqual(first, third)
+        self.assertIn('updateBranchProtectionRule', first)
+        self.assertIn('reviewDismissalActorIds: ["team-a", "team-x"]', first)
+        self.assertIn('pushActorIds: ["team-a", "team-x"]', first)
+        self.assertIn('requiredStatusCheckContexts: ["continuous-integration/jenkins/branch", '
+                      '"continuous-integration/jenkins/pr-merge"]', first)
+        self.assertIn('createBranchProtectionRule', second)
+        self.assertIn('requiredStatusCheckContexts: ["ci", "continuous-integration/jenkins/branch", '
+                      '"continuous-integration/jenkins/pr-merge"]', second)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from github_team_organizer.classes.report import get_missing_shards, merge_reports
+from github_team_organizer.classes.sharding import get_shard
+
+
+IDENTITIES = [('acme', 'repository', name) for name in ('api', 'web', 'docs', 'infra')]
+
+
+class GetShardTest(unittest.TestCase):
+
+    def test_shards_are_pinned(self):
+        # Shards of running deployments must not move, a changed hash would reassign objects between shards
+        self.assertEqual([get_shard(identity, 4) for identity in IDENTITIES], [0, 1, 1, 0])
+
+    def test_shards_do_not_depend_on_hash_seed(self):
+        code = (
+            'from github_team_organizer.classes.sharding import get_shard;'
+            f'print([get_shard(identity, 4) for identity in {IDENTITIES!r}])'
+        )
+        for seed in ('1', '2'):
+            output = subprocess.check_output(
+                [sys.executable, '-c', code], env={**os.environ, 'PYTHONHASHSEED': seed}, text=True,
+            )
+            self.assertEqual(output.strip(), '[0, 1, 1, 0]')
+
+
+def shard_report(index: int, plan: list) -> dict:
+    return {
+        'shards': [{'index': index, 'count': 2}],
+        'organizations': ['acme'],
+        'plan': plan,
+        'collaborators': {},
+        'unmanaged_repositories': {'acme': ['legacy']},
+    }
+
+
+class MergeReportsTest(unittest.TestCase):
+
+    def test_changes_planned_by_several_shards_are_merged(self):
+        add_team = {
+            'organization': 'acme', 'kind': 'repository', 'name': 'api', 'action': 'add_team',
+            'details': {'team': 'core', 'permission': 'push'},
+        }
+        reordered = {**add_team, 'details': {'permission': 'push', 'team': 'core'}}
+        add_other = {**add_team, 'details': {'team': 'web', 'permission': 'push'}}
+
+        merged = merge_reports([shard_report(1, [add_team, add_other]), shard_report(0, [reordered])])
+
+        self.assertEqual(merged['plan'], [add_team, add_other])
+        self.assertEqual(merged['shards'], [{'index': 0, 'count': 2}, {'index': 1, 'count': 2}])
+        self.assertEqual(merged['unmanaged_repositories'], {'acme': ['legacy']})
+        self.assertEqual(get_missing_shards(merged), [])
+
+    def test_missing_shards_are_reported(self):
+        self.assertEqual(get_missing_shards(merge_reports([shard_report(1, [])])), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()